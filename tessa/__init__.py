@@ -5,9 +5,12 @@
 from .sources import SourceType
 from .price import (
     price_history,
+    price_history_many,
     price_point,
+    price_points,
     price_point_strict,
     price_latest,
+    price_latest_many,
 )
 from .search import search
 from .symbol import Symbol, ExtendedSymbol, SymbolCollection
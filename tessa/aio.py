@@ -0,0 +1,184 @@
+"""
+# Asynchronous price retrieval
+
+Counterparts of the main price functions for use in asyncio applications. They don't
+block the event loop: Rate limiting and back-offs are awaited, and the blocking calls
+into the underlying libraries run in worker threads. All functions share the caches
+(including a persistent store, see `tessa.price.store`) with their synchronous
+counterparts in `tessa.price.price`, and concurrent calls for the same history or
+latest price are coalesced into a single retrieval just like there.
+(Stale-while-revalidate refreshes run in the same background threads as for the
+synchronous functions.)
+
+Example use:
+
+```python
+>>> from tessa import aio
+
+>>> df, currency = await aio.price_history("AAPL")
+
+>>> await asyncio.gather(*(aio.price_latest(q) for q in ["AAPL", "MSFT", "TSLA"]))
+```
+"""
+
+from __future__ import annotations
+from typing import Optional, Tuple, Union, TYPE_CHECKING
+import asyncio
+import pandas as pd
+from .price import PriceHistory, PricePoint
+from .price.types import CircuitOpenError
+from .price.retrieval import (
+    PRICE_CACHE,
+    LATEST_PRICE_CACHE,
+    as_timestamp,
+    plan_retrieval,
+    complete_retrieval,
+    slice_history,
+    deadline_retry_policy,
+    stale_price_history,
+    peek_expired,
+    revalidate,
+    refresh_price_history,
+    refresh_latest_price,
+    price_point_from_history,
+    latest_price_point,
+    hand_out,
+    remembering_failures,
+    cache_key,
+)
+from .price.cache import Coverage
+from .price.store import get_price_store
+from .singleflight import AsyncSingleFlight
+from . import sources
+
+if TYPE_CHECKING:
+    from . import SourceType
+
+IN_FLIGHT = AsyncSingleFlight()
+"""Coalesces concurrent retrievals of the same price history or latest price, see
+`tessa.price.price.IN_FLIGHT`.
+"""
+
+
+async def _retrieve_price_history(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[PriceHistory, Coverage]:
+    """Asynchronous version of `tessa.price.retrieval.retrieve_price_history`."""
+    src = sources.get_source(source)
+    retry_policy = deadline_retry_policy(src, deadline)
+    args = (query, source, currency_preference)
+    if get_price_store() is not None:
+        plan = await asyncio.to_thread(plan_retrieval, *args, start, end)
+    else:
+        plan = plan_retrieval(*args, start, end)
+    if plan.ready is not None:
+        return plan.ready, plan.coverage
+    retrieved = []
+    for segment_start, segment_end in plan.segments:
+        await src.rate_limiter.rate_limit_async()
+        retrieved.append(
+            await src.get_price_history_bruteforcefully_async(
+                query,
+                currency_preference,
+                start=segment_start,
+                end=segment_end,
+                retry_policy=retry_policy,
+            )
+        )
+    history = await asyncio.to_thread(complete_retrieval, *args, plan, retrieved)
+    return history, plan.coverage
+
+
+async def price_history(
+    query: str,
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+    copy: bool = True,
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+    deadline: Optional[float] = None,
+) -> PriceHistory:
+    """Asynchronous version of `tessa.price.price.price_history`."""
+    start, end = as_timestamp(start), as_timestamp(end)
+    key = cache_key(query, source, currency_preference)
+    query, source, currency_preference = key
+    history = PRICE_CACHE.get(key, start, end)
+    if history is None:
+
+        async def retrieve() -> PriceHistory:
+            try:
+                with remembering_failures(key):
+                    history, coverage = await _retrieve_price_history(
+                        query, source, currency_preference, start, end, deadline
+                    )
+            except CircuitOpenError as exc:
+                return await asyncio.to_thread(
+                    stale_price_history, query, source, currency_preference, exc
+                )
+            PRICE_CACHE.put(key, history, coverage)
+            return history
+
+        history = await IN_FLIGHT.do(("history",) + key + (start, end), retrieve)
+    elif PRICE_CACHE.is_stale(key):
+        revalidate(("history",) + key, refresh_price_history, *key)
+    return hand_out(slice_history(history, start, end), copy)
+
+
+async def price_point(
+    query: str,
+    when: Union[str, pd.Timestamp],
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+    max_date_deviation_days: Union[int, None] = 10,
+) -> PricePoint:
+    """Asynchronous version of `tessa.price.price.price_point`."""
+    history = await price_history(query, source, currency_preference, copy=False)
+    return price_point_from_history(history, when, max_date_deviation_days)
+
+
+async def price_latest(
+    query: str,
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+) -> PricePoint:
+    """Asynchronous version of `tessa.price.price.price_latest`."""
+    key = cache_key(query, source, currency_preference)
+    query, source, currency_preference = key
+    src = sources.get_source(source)
+    if key in PRICE_CACHE or src.get_latest_price is None:
+        history = await price_history(query, source, currency_preference, copy=False)
+        return latest_price_point(history)
+    latest = LATEST_PRICE_CACHE.get(key)
+    if latest is None:
+
+        async def retrieve() -> PriceHistory:
+            try:
+                with remembering_failures(key):
+                    await src.rate_limiter.rate_limit_async()
+                    df, effective_currency = (
+                        await src.get_latest_price_bruteforcefully_async(
+                            query, currency_preference
+                        )
+                    )
+            except CircuitOpenError as exc:
+                return await asyncio.to_thread(
+                    stale_price_history,
+                    query,
+                    source,
+                    currency_preference,
+                    exc,
+                    peek_expired(LATEST_PRICE_CACHE, key),
+                )
+            latest = PriceHistory(df, effective_currency.upper())
+            LATEST_PRICE_CACHE.put(key, latest)
+            return latest
+
+        latest = await IN_FLIGHT.do(("latest",) + key, retrieve)
+    elif LATEST_PRICE_CACHE.is_stale(key):
+        revalidate(("latest",) + key, refresh_latest_price, *key)
+    return latest_price_point(latest)
@@ -5,11 +5,28 @@ Main functions:
 
 - `tessa.price.price.price_history`: Retrieve the full history of an asset as a
   dataframe.
+- `tessa.price.price.price_history_many`: Retrieve the histories of several assets at
+  once.
+- `tessa.price.panel.price_panel`: Line up the prices of several assets at several
+  dates in one dataframe.
+- `tessa.price.fetch.fetch_price_histories`: Retrieve the histories of several assets
+  from different sources concurrently.
 - `tessa.price.price.price_point_strict`: Get an asset's price at a certain point in
   time. Fail if no price found.
 - `tessa.price.price.price_point`: Same, but find the nearest price if the given point
   in time has no price.
+- `tessa.price.price.price_points`: Same as `price_point` but for many points in time
+  at once.
 - `tessa.price.price.price_latest`: Get an asset's latest price.
+- `tessa.price.price.price_latest_many`: Get the latest prices of several assets at
+  once.
+
+Asynchronous counterparts of the main functions are available in `tessa.aio`.
+
+Price histories are cached in memory; see `tessa.price.cache` for how to bound the
+cache and `tessa.price.snapshot` for how to ship a warm cache to other machines
+(`cache_export` and `cache_import`). Use `tessa.price.store` to also keep them in a
+persistent store across restarts.
 
 
 Example use:
@@ -38,7 +55,13 @@ Example use:
 from .types import PriceHistory, PricePoint
 from .price import (
     price_history,
+    price_history_many,
     price_point,
+    price_points,
     price_point_strict,
     price_latest,
+    price_latest_many,
 )
+from .fetch import fetch_price_histories, PriceRequest, FetchReport
+from .panel import price_panel, PricePanel
+from .snapshot import cache_export, cache_import
@@ -0,0 +1,389 @@
+"""In-memory cache for price histories.
+
+By default, the cache grows without limit. To bound it, e.g., in a long-running
+service, set a byte budget and/or a time to live on the cache used by the price
+functions:
+
+```python
+from tessa.price.retrieval import PRICE_CACHE
+PRICE_CACHE.max_bytes = 200 * 1024 * 1024   # Evict least recently used beyond 200 MB
+PRICE_CACHE.ttl_seconds = 6 * 60 * 60       # Evict entries older than 6 hours
+```
+
+`tessa.price.price.price_history.cache_info()` reports the cache's stats and
+`tessa.price.price.price_history.cache_keys()` lists the cached keys. Keys are
+canonical (see `tessa.price.retrieval.cache_key`), so, e.g., `price_history("aapl",
+currency_preference="usd")` and `price_history("AAPL")` share one entry.
+
+For interactive use, where an immediate answer matters more than the latest data, set a
+soft time to live as well ("stale-while-revalidate"): Entries older than that are still
+returned right away, but get refreshed in the background (through the source's rate
+limiter). Only entries older than `ttl_seconds` make callers wait for a refresh.
+
+```python
+PRICE_CACHE.soft_ttl_seconds = 60 * 60       # Refresh in the background after 1 hour
+PRICE_CACHE.ttl_seconds = 24 * 60 * 60       # Wait for a refresh after 1 day
+LATEST_PRICE_CACHE.soft_ttl_seconds = 30     # (Hard time to live is 60 seconds.)
+```
+
+Entries know which date range they cover (see `Coverage`), so a request for a narrower
+range can be served from an entry covering a wider one.
+
+Permanent failures (unknown symbols or currency preferences, see `PERMANENT_ERRORS`) are
+remembered in a separate `NegativeCache`, so repeating a bad query fails right away
+instead of costing another request. Transient failures such as rate limit hits are
+never remembered.
+
+```python
+from tessa.price.retrieval import NEGATIVE_CACHE
+NEGATIVE_CACHE.ttl_seconds = 24 * 60 * 60   # Remember failures for a day
+```
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+import threading
+import time
+import pandas as pd
+from .types import (
+    PriceHistory,
+    SymbolNotFoundError,
+    CurrencyPreferenceNotFoundError,
+)
+
+CacheInfo = NamedTuple(
+    "CacheInfo",
+    [
+        ("hits", int),
+        ("misses", int),
+        ("evictions", int),
+        ("currsize", int),
+        ("nbytes", int),
+        ("max_bytes", Optional[int]),
+    ],
+)
+"""Cache statistics, similar to what `functools.lru_cache` reports, plus the number
+of evicted entries and the memory used by the cached dataframes.
+"""
+
+PERMANENT_ERRORS = (SymbolNotFoundError, CurrencyPreferenceNotFoundError)
+"""Errors that won't go away by retrying and are therefore remembered in a
+`NegativeCache`.
+"""
+
+CacheKey = NamedTuple(
+    "CacheKey", [("query", str), ("source", str), ("currency_preference", str)]
+)
+"""The canonical key of a cached price history or latest price, see
+`tessa.price.retrieval.cache_key`.
+"""
+
+Coverage = Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]
+"""The date range `[start, end)` a cached history covers. `None` stands for an open
+end, i.e., everything the source has before `end` or after `start`, respectively.
+"""
+
+FULL_COVERAGE: Coverage = (None, None)
+"""The coverage of a full history."""
+
+CacheEntry = NamedTuple(
+    "CacheEntry",
+    [
+        ("history", PriceHistory),
+        ("nbytes", int),
+        ("stored_at", float),
+        ("coverage", Coverage),
+    ],
+)
+"""A cached history together with its size, the (monotonic) time it was cached, and
+the date range it covers.
+"""
+
+
+def covers(
+    coverage: Coverage, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+) -> bool:
+    """Check if `coverage` includes the range from `start` to `end`."""
+    cov_start, cov_end = coverage
+    return (cov_start is None or (start is not None and start >= cov_start)) and (
+        cov_end is None or (end is not None and end <= cov_end)
+    )
+
+
+def missing_segments(
+    coverage: Coverage, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+) -> List[Coverage]:
+    """Return the ranges that need to be added to `coverage` so it includes the range
+    from `start` to `end`. Gaps between the two are included as well, so coverage
+    always remains a single range.
+    """
+    cov_start, cov_end = coverage
+    segments = []
+    if cov_start is not None and (start is None or start < cov_start):
+        segments.append((start, cov_start))
+    if cov_end is not None and (end is None or end > cov_end):
+        segments.append((cov_end, end))
+    return segments
+
+
+def union(
+    coverage: Coverage, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+) -> Coverage:
+    """Return the range covering both `coverage` and the range from `start` to `end`."""
+    cov_start, cov_end = coverage
+    return (
+        None if cov_start is None or start is None else min(cov_start, start),
+        None if cov_end is None or end is None else max(cov_end, end),
+    )
+
+
+def read_only(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy of `df` whose data can't be modified in place. Views of it can be
+    handed out without risking that the original gets modified.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy(copy=True)
+        values.flags.writeable = False
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def history_nbytes(history: PriceHistory) -> int:
+    """Return the memory used by a history's dataframe, including its index."""
+    return int(history.df.memory_usage(index=True, deep=True).sum())
+
+
+class PriceCache:
+    """A thread-safe in-memory cache for `PriceHistory` objects with optional
+    least-recently-used eviction beyond a byte budget and time-based expiry.
+    """
+
+    max_bytes: Optional[int]
+    """Evict the least recently used entries once the cached dataframes use more memory
+    than this. `None` for no limit. Takes effect with the next entry added.
+    """
+
+    ttl_seconds: Optional[float]
+    """Treat entries older than this as missing and evict them (at the latest when the
+    next entry is added). `None` for no expiry.
+    """
+
+    soft_ttl_seconds: Optional[float]
+    """Consider entries older than this stale, see `is_stale`. `None` to never consider
+    entries stale.
+    """
+
+    hits: int
+    """Number of lookups that found an entry."""
+
+    misses: int
+    """Number of lookups that didn't find an entry."""
+
+    evictions: int
+    """Number of entries evicted because of `max_bytes` or `ttl_seconds`."""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        soft_ttl_seconds: Optional[float] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return (
+            self.ttl_seconds is not None
+            and time.monotonic() - entry.stored_at > self.ttl_seconds
+        )
+
+    def _remove(self, key: Hashable) -> None:
+        self._nbytes -= self._entries.pop(key).nbytes
+
+    def _purge_expired(self) -> None:
+        """Evict all expired entries. (Call with the lock held.)"""
+        if self.ttl_seconds is None:
+            return
+        for key in [k for k, e in self._entries.items() if self._is_expired(e)]:
+            self._remove(key)
+            self.evictions += 1
+
+    def get(
+        self,
+        key: Hashable,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> Optional[PriceHistory]:
+        """Return the cached history for `key` if it covers the range from `start` to
+        `end` (the full history by default), otherwise `None`. Note that the returned
+        history may cover a wider range. Updates the stats.
+
+        Expired entries count as missing but are only evicted when the next entry is
+        added, so they can still serve as a fallback, see `peek`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                entry = None
+            if entry is None or not covers(entry.coverage, start, end):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.history
+
+    def peek(self, key: Hashable, expired: bool = False) -> Optional[CacheEntry]:
+        """Return the unexpired entry for `key` (whatever range it covers) or `None`
+        without updating the stats. Use `expired=True` to return expired entries that
+        haven't been evicted yet, too.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self._is_expired(entry) and not expired):
+                return None
+            return entry
+
+    def is_stale(self, key: Hashable) -> bool:
+        """Check if the entry for `key` is older than `soft_ttl_seconds`, i.e., can
+        still be used but should be refreshed.
+        """
+        entry = self.peek(key)
+        return (
+            entry is not None
+            and self.soft_ttl_seconds is not None
+            and time.monotonic() - entry.stored_at > self.soft_ttl_seconds
+        )
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for an unexpired entry with the full history without updating the
+        stats.
+        """
+        entry = self.peek(key)
+        return entry is not None and entry.coverage == FULL_COVERAGE
+
+    def put(
+        self,
+        key: Hashable,
+        history: PriceHistory,
+        coverage: Coverage = FULL_COVERAGE,
+        age_seconds: float = 0.0,
+    ) -> None:
+        """Add or replace the entry for `key`, covering the date range `coverage`, then
+        evict the least recently used entries until the cache fits into `max_bytes`
+        again. (The entry just added is kept in any case.) The cached dataframe is made
+        read-only, see `read_only`. Use `age_seconds` if the history was retrieved
+        earlier than now, so it expires accordingly.
+        """
+        history = PriceHistory(read_only(history.df), history.currency)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._purge_expired()
+            entry = CacheEntry(
+                history,
+                history_nbytes(history),
+                time.monotonic() - age_seconds,
+                coverage,
+            )
+            self._entries[key] = entry
+            self._nbytes += entry.nbytes
+            while (
+                self.max_bytes is not None
+                and self._nbytes > self.max_bytes
+                and len(self._entries) > 1
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def keys(self) -> List[Hashable]:
+        """Return the keys of all unexpired entries, least recently used first."""
+        with self._lock:
+            return [k for k, e in self._entries.items() if not self._is_expired(e)]
+
+    def clear(self) -> None:
+        """Remove all entries and reset the stats."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        """Return the current stats. (Evicts expired entries first, so they don't
+        count.)
+        """
+        with self._lock:
+            self._purge_expired()
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.evictions,
+                len(self._entries),
+                self._nbytes,
+                self.max_bytes,
+            )
+
+
+class NegativeCache:
+    """A thread-safe in-memory cache for permanent failures (see `PERMANENT_ERRORS`),
+    with time-based expiry.
+    """
+
+    ttl_seconds: Optional[float]
+    """Forget failures after this many seconds. `None` to remember them forever."""
+
+    hits: int
+    """Number of lookups that found a failure."""
+
+    def __init__(self, ttl_seconds: Optional[float] = 60 * 60) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._failures: Dict[Hashable, Tuple[Exception, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, key: Hashable) -> Optional[Exception]:
+        """Return the unexpired failure for `key` or `None`."""
+        with self._lock:
+            failure = self._failures.get(key)
+            if failure is None:
+                return None
+            exc, stored_at = failure
+            if (
+                self.ttl_seconds is not None
+                and time.monotonic() - stored_at > self.ttl_seconds
+            ):
+                del self._failures[key]
+                return None
+            self.hits += 1
+            return exc
+
+    def put(self, key: Hashable, exc: Exception) -> None:
+        """Remember `exc` for `key` if it is a permanent failure, otherwise do nothing."""
+        if isinstance(exc, PERMANENT_ERRORS):
+            with self._lock:
+                self._failures[key] = (exc, time.monotonic())
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for an unexpired failure without updating the stats."""
+        with self._lock:
+            failure = self._failures.get(key)
+            return failure is not None and (
+                self.ttl_seconds is None
+                or time.monotonic() - failure[1] <= self.ttl_seconds
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._failures)
+
+    def clear(self) -> None:
+        """Forget all failures and reset the stats."""
+        with self._lock:
+            self._failures.clear()
+            self.hits = 0
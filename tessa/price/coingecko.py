@@ -1,5 +1,8 @@
 """Everything coingecko-related (other than search)."""
 
+from typing import Dict, List, Optional, Tuple, Union
+import functools
+import math
 import pandas as pd
 from pycoingecko import CoinGeckoAPI
 from .types import (
@@ -8,40 +11,291 @@ from .types import (
     CurrencyPreferenceNotFoundError,
     RateLimitHitError,
 )
+from .cache import PriceCache
+
+
+def normalize_query(query: str) -> str:
+    """Return the canonical form of `query`. (Coingecko ids are lower-case.)"""
+    return query.strip().lower()
+
+
+def get_api() -> CoinGeckoAPI:
+    """Return a `CoinGeckoAPI` that uses the Coingecko source's shared HTTP session."""
+    # pylint: disable=import-outside-toplevel
+    from ..sources import get_source  # (Late import to prevent circular imports.)
+
+    http_session = get_source("coingecko").http_session
+    return _get_api(http_session.get(), http_session.timeout)
+
+
+def _rate_limit() -> None:
+    """Take a token from the Coingecko source's rate limiter for an additional request.
+    (Callers only take one token per call, which covers the first request.)
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..sources import get_source  # (Late import to prevent circular imports.)
+
+    get_source("coingecko").rate_limiter.rate_limit()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_api(session: object, timeout: float) -> CoinGeckoAPI:
+    api = CoinGeckoAPI()
+    api.session.close()
+    api.session = session
+    api.request_timeout = timeout
+    return api
 
 
 def dataframify_price_list(prices: list) -> pd.DataFrame:
     """Turn price list returned by Coingecko API into a pricing dataframe in the form
     that we use.
     """
-    df = pd.DataFrame(prices)
-    df.columns = ["date", "close"]
+    df = pd.DataFrame(prices, columns=["date", "close"])
     df["date"] = pd.to_datetime(df["date"] / 1000, unit="s", utc=True)
     df = df.set_index("date")
     return df
 
 
-def get_price_history(query: str, currency_preference: str = "USD") -> PriceHistory:
-    """Get price history for a given cryptocurrency."""
+MAX_DAYS = 365
+"""Public API is limited to 365 days back."""
+
+HISTORY_START: Optional[str] = None
+"""Retrieve the history from this date on if no `start` is given; `None` to only
+retrieve the last `MAX_DAYS` days. Set this (or pass an earlier `start`) to retrieve
+longer histories, which are retrieved in chunks via the range endpoint -- this requires
+an API tier that allows it.
+
+(With the public API, use a persistent store with incremental refreshes instead to
+accumulate history beyond `MAX_DAYS` over time, see `tessa.price.store`.)
+"""
+
+CHUNK_DAYS = 365
+"""Length of the chunks to retrieve long histories in. Chunks are aligned to fixed
+boundaries, so completed chunks can be memoized. (Needs to be longer than 90 days, so
+Coingecko returns daily prices.)
+"""
+
+
+def _as_utc(when: Union[str, pd.Timestamp]) -> pd.Timestamp:
+    when = pd.Timestamp(when)
+    return when.tz_localize("UTC") if when.tz is None else when
+
+
+def days_since(start: Optional[Union[str, pd.Timestamp]]) -> int:
+    """Number of days to request in order to cover everything from `start` until now,
+    capped at `MAX_DAYS`.
+    """
+    if start is None:
+        return MAX_DAYS
+    days = (pd.Timestamp.now("UTC") - _as_utc(start)).total_seconds() / (24 * 60 * 60)
+    return min(MAX_DAYS, max(1, math.ceil(days)))
+
+
+def _get_market_chart(query: str, currency_preference: str, days: int) -> list:
+    """Get the daily prices for the last `days` days."""
+    try:
+        return get_api().get_coin_market_chart_by_id(
+            id=query, vs_currency=currency_preference, days=str(days), interval="daily"
+        )["prices"]
+    except ValueError as exc:
+        error = _translate_error(exc, query, currency_preference)
+        if error is None:
+            raise
+        raise error from exc
+
+
+COMPLETED_CHUNKS = PriceCache(max_bytes=20 * 1024 * 1024)
+"""Memoizes completed chunks, keyed by query, currency preference and chunk start, so
+they are only retrieved once. Evicts the least recently used chunks beyond 20 MB and is
+cleared by `tessa.price.price_history.cache_clear()`.
+"""
+
+
+def _get_range(
+    query: str, currency_preference: str, from_timestamp: int, to_timestamp: int
+) -> list:
+    """Get the prices from `from_timestamp` up to `to_timestamp`."""
     try:
-        res = CoinGeckoAPI().get_coin_market_chart_by_id(
+        return get_api().get_coin_market_chart_range_by_id(
             id=query,
             vs_currency=currency_preference,
-            days="365",  # Public API is limited to 365 days back
-            interval="daily",
+            from_timestamp=str(from_timestamp),
+            to_timestamp=str(to_timestamp),
         )["prices"]
     except ValueError as exc:
-        if "invalid vs_currency" in str(exc):
-            raise CurrencyPreferenceNotFoundError(
-                source="coingecko", cur_pref=currency_preference
-            ) from exc
-        if "429" in str(exc):
-            # (pycoingecko masks the underlying HTTPError.)
-            raise RateLimitHitError(source="coingecko") from exc
-        if "exceeds the allowed time range" in str(exc):
-            raise ValueError(
-                "Coingecko's public API is limited to historical data 365 days back."
-            ) from exc
-        raise SymbolNotFoundError(source="coingecko", query=query) from exc
-
-    return PriceHistory(dataframify_price_list(res), currency_preference)
+        error = _translate_error(exc, query, currency_preference)
+        if error is None:
+            raise
+        raise error from exc
+
+
+def _get_chunked(
+    query: str,
+    currency_preference: str,
+    start: pd.Timestamp,
+    end: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """Get the prices from `start` (to `end` or now) chunk by chunk: Completed chunks
+    via the range endpoint (memoized in `COMPLETED_CHUNKS`), the current chunk via the
+    market chart. Takes a rate limiter token for each request but the first.
+    """
+    chunk_seconds = CHUNK_DAYS * 24 * 60 * 60
+    now = int(pd.Timestamp.now("UTC").timestamp())
+    until = now if end is None else min(now, int(end.timestamp()))
+    chunk_start = int(start.timestamp()) // chunk_seconds * chunk_seconds
+    frames, requests = [], 0
+    while chunk_start + chunk_seconds <= now and chunk_start < until:
+        key = (query, currency_preference, chunk_start)
+        chunk = COMPLETED_CHUNKS.get(key)
+        if chunk is None:
+            if requests:
+                _rate_limit()
+            requests += 1
+            prices = _get_range(
+                query, currency_preference, chunk_start, chunk_start + chunk_seconds
+            )
+            chunk = PriceHistory(dataframify_price_list(prices), currency_preference)
+            COMPLETED_CHUNKS.put(key, chunk)
+        frames.append(chunk.df)
+        chunk_start += chunk_seconds
+    if chunk_start < until:
+        if requests:
+            _rate_limit()
+        current_start = pd.Timestamp(chunk_start, unit="s", tz="UTC")
+        prices = _get_market_chart(
+            query, currency_preference, days_since(current_start)
+        )
+        frames.append(dataframify_price_list(prices))
+    if not frames:
+        return dataframify_price_list([])
+    return pd.concat(frames)
+
+
+def get_price_history(
+    query: str,
+    currency_preference: str = "USD",
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+) -> PriceHistory:
+    """Get price history for a given cryptocurrency. Use `start` and `end` (exclusive)
+    to only retrieve the history within that range. `start` defaults to
+    `HISTORY_START`; histories reaching back further than `MAX_DAYS` are retrieved in
+    chunks (as far as the API allows).
+    """
+    if start is None:
+        start = HISTORY_START
+    long_ago = pd.Timestamp.now("UTC") - pd.Timedelta(days=MAX_DAYS)
+    if start is not None and _as_utc(start) < long_ago:
+        start = _as_utc(start)
+        df = _get_chunked(
+            query, currency_preference, start, None if end is None else _as_utc(end)
+        )
+    else:
+        prices = _get_market_chart(query, currency_preference, days_since(start))
+        df = dataframify_price_list(prices)
+        start = None
+
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    if start is not None:
+        df = df[df.index >= start]
+    if end is not None:
+        df = df[df.index < _as_utc(end)]
+    return PriceHistory(df, currency_preference)
+
+
+def get_latest_price(query: str, currency_preference: str = "USD") -> PriceHistory:
+    """Get the latest price for a given cryptocurrency as a `PriceHistory` with a
+    single row. Uses the lightweight simple price endpoint instead of the market chart.
+    """
+    try:
+        res = get_api().get_price(
+            ids=query,
+            vs_currencies=currency_preference,
+            include_last_updated_at="true",
+        )
+    except ValueError as exc:
+        error = _translate_error(exc, query, currency_preference)
+        if error is None:
+            raise
+        raise error from exc
+    if query not in res:
+        raise SymbolNotFoundError(source="coingecko", query=query)
+    if currency_preference.lower() not in res[query]:
+        raise CurrencyPreferenceNotFoundError(
+            source="coingecko", cur_pref=currency_preference
+        )
+    entry = res[query]
+    price = [entry["last_updated_at"] * 1000, entry[currency_preference.lower()]]
+    return PriceHistory(dataframify_price_list([price]), currency_preference)
+
+
+MAX_IDS_PER_REQUEST = 250
+"""Maximum number of ids to request in one simple price request, so the URL doesn't get
+too long.
+"""
+
+
+def get_latest_prices(
+    queries: List[str], currency_preferences: List[str]
+) -> Dict[Tuple[str, str], PriceHistory]:
+    """Get the latest prices for several cryptocurrencies in several currencies with as
+    few simple price requests as possible. Returns a dictionary mapping each (query,
+    currency preference) pair to a `PriceHistory` with a single row; pairs that aren't
+    found are left out. Takes a rate limiter token for each request but the first.
+    """
+    histories = {}
+    for i in range(0, len(queries), MAX_IDS_PER_REQUEST):
+        chunk = queries[i : i + MAX_IDS_PER_REQUEST]
+        if i:
+            _rate_limit()
+        try:
+            res = get_api().get_price(
+                ids=",".join(chunk),
+                vs_currencies=",".join(currency_preferences),
+                include_last_updated_at="true",
+            )
+        except ValueError as exc:
+            error = _translate_error(exc, ",".join(chunk), currency_preferences[0])
+            if error is None or isinstance(error, SymbolNotFoundError):
+                # (Unknown ids are just left out, so this isn't about a symbol.)
+                raise
+            raise error from exc
+        for query in chunk:
+            entry = res.get(query, {})
+            for currency_preference in currency_preferences:
+                if currency_preference.lower() not in entry:
+                    continue
+                price = [
+                    entry["last_updated_at"] * 1000,
+                    entry[currency_preference.lower()],
+                ]
+                histories[(query, currency_preference)] = PriceHistory(
+                    dataframify_price_list([price]), currency_preference
+                )
+    return histories
+
+
+def _translate_error(
+    exc: ValueError, query: str, currency_preference: str
+) -> Optional[Exception]:
+    """Turn an error raised by pycoingecko into the corresponding tessa error. Returns
+    `None` for errors that don't have one (e.g., invalid API keys or server errors),
+    which are to be re-raised as they are -- so they don't end up in the negative cache
+    as unknown symbols.
+    """
+    if "invalid vs_currency" in str(exc):
+        return CurrencyPreferenceNotFoundError(
+            source="coingecko", cur_pref=currency_preference
+        )
+    if "429" in str(exc):
+        # (pycoingecko masks the underlying HTTPError.)
+        return RateLimitHitError(source="coingecko")
+    if "exceeds the allowed time range" in str(exc):
+        return ValueError(
+            "Coingecko's public API is limited to historical data 365 days back. "
+            "Check `tessa.price.coingecko.HISTORY_START`."
+        )
+    if "coin not found" in str(exc):
+        return SymbolNotFoundError(source="coingecko", query=query)
+    return None
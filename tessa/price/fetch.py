@@ -0,0 +1,88 @@
+"""Retrieve price histories from several sources concurrently.
+
+Every source gets its own worker thread (or several, see `workers_per_source`), which
+works through that source's requests. So each source still respects its own rate limiter
+(including any back-off), while the different sources are queried in parallel. A mixed
+portfolio of, e.g., Yahoo and Coingecko symbols therefore takes as long as the slowest
+source rather than the sum of all sources.
+"""
+
+from __future__ import annotations
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, TYPE_CHECKING
+from .types import PriceHistory
+from . import price
+
+if TYPE_CHECKING:
+    from ..sources.sourcetype import SourceType
+
+PriceRequest = NamedTuple(
+    "PriceRequest",
+    [("query", str), ("source", "SourceType"), ("currency_preference", str)],
+)
+"""Everything needed to request a price history; same order as the arguments of
+`tessa.price.price.price_history`.
+"""
+
+FetchReport = NamedTuple(
+    "FetchReport",
+    [
+        ("results", Dict[PriceRequest, PriceHistory]),
+        ("errors", Dict[PriceRequest, Exception]),
+    ],
+)
+"""The outcome of `fetch_price_histories`: The retrieved histories and the errors for
+the requests that failed.
+"""
+
+
+def fetch_price_histories(
+    requests: Iterable[tuple],
+    on_done: Optional[Callable[[PriceRequest, Optional[Exception]], None]] = None,
+    copy: bool = True,
+    workers_per_source: int = 1,
+) -> FetchReport:
+    """Retrieve the price histories for all `requests` (tuples of query, source, and
+    currency preference), querying different sources concurrently. Results go through
+    `tessa.price.price.price_history` and therefore end up in the same caches.
+
+    A failing request doesn't abort the others; its error is reported in the returned
+    `FetchReport` instead. `on_done` is called after each request with the request and
+    the error (or `None`). See `tessa.price.price.price_history` regarding `copy`.
+
+    Use `workers_per_source` > 1 to have several requests per source in flight at once,
+    e.g., with a rate limiter that allows bursts (see `tessa.sources.rate_limiter`). The
+    workers still go through the source's rate limiter.
+    """
+    lanes: Dict[SourceType, List[PriceRequest]] = defaultdict(list)
+    for request in dict.fromkeys(PriceRequest(*r) for r in requests):
+        lanes[request.source].append(request)
+
+    workers = []
+    for lane in lanes.values():
+        queue: SimpleQueue = SimpleQueue()
+        for request in lane:
+            queue.put(request)
+        workers.extend([queue] * max(1, min(workers_per_source, len(lane))))
+
+    report = FetchReport({}, {})
+
+    def work_through(queue: SimpleQueue) -> None:
+        while True:
+            try:
+                request = queue.get_nowait()
+            except Empty:
+                return
+            error = None
+            try:
+                report.results[request] = price.price_history(*request, copy=copy)
+            except Exception as exc:  # pylint: disable=broad-except
+                error = report.errors[request] = exc
+            if on_done is not None:
+                on_done(request, error)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(workers))) as executor:
+        list(executor.map(work_through, workers))
+    return report
@@ -0,0 +1,86 @@
+"""Cross-sectional price panels: Prices of many assets at many dates in one dataframe."""
+
+from __future__ import annotations
+from typing import Dict, Iterable, NamedTuple, Optional, Union, TYPE_CHECKING
+import numpy as np
+import pandas as pd
+from .fetch import PriceRequest, fetch_price_histories
+
+if TYPE_CHECKING:
+    from ..sources.sourcetype import SourceType
+    from ..symbol import Symbol
+
+PricePanel = NamedTuple(
+    "PricePanel", [("df", pd.DataFrame), ("currencies", Dict[str, str])]
+)
+"""A dataframe with one row per date and one column per asset, plus a dictionary
+mapping each column to its currency.
+"""
+
+
+def _as_utc(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Bring `index` into UTC and nanosecond resolution so indexes can be joined."""
+    index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+    return index.as_unit("ns")
+
+
+def price_panel(
+    queries_or_symbols: Iterable[Union[str, Symbol]],
+    dates: Iterable[Union[str, pd.Timestamp]],
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+    tolerance: Optional[Union[str, pd.Timedelta]] = pd.Timedelta(days=10),
+) -> PricePanel:
+    """Line up the prices of several assets at the given `dates` in one dataframe and
+    return a `PricePanel`.
+
+    - `queries_or_symbols`: Query strings (which will use `source` and
+      `currency_preference`) or `Symbol`s (which bring their own). A
+      `tessa.symbol.symbolcollection.SymbolCollection` works, too. Columns are named
+      after the queries or the symbols' names, respectively, which need to be unique.
+    - `dates`: The dates (rows) of the panel.
+    - `tolerance`: Like `price_point`, each date gets the nearest price; prices further
+      away than `tolerance` are reported as missing values. Use `None` to disable this.
+
+    Every history is retrieved once (concurrently across sources, see
+    `tessa.price.fetch`) and aligned with a vectorized as-of join. Raises the first error
+    encountered if any of the histories can't be retrieved.
+    """
+    requests: Dict[str, PriceRequest] = {}
+    for item in queries_or_symbols:
+        if isinstance(item, str):
+            label, request = item, PriceRequest(item, source, currency_preference)
+        else:
+            label = item.name
+            request = PriceRequest(item.query, item.source, item.currency_preference)
+        if label in requests:
+            raise ValueError(f"Found several columns named '{label}'.")
+        requests[label] = request
+
+    report = fetch_price_histories(requests.values(), copy=False)
+    if report.errors:
+        raise next(iter(report.errors.values()))
+
+    if not isinstance(dates, (pd.Index, pd.Series, np.ndarray)):
+        dates = list(dates)
+    dates = _as_utc(pd.DatetimeIndex(pd.to_datetime(dates, format="mixed")))
+    order = np.argsort(dates, kind="stable")
+    left = pd.DataFrame({"date": dates[order]})
+    tolerance = None if tolerance is None else pd.Timedelta(tolerance)
+
+    columns = {}
+    currencies = {}
+    for label, request in requests.items():
+        df, currency = report.results[request]
+        right = pd.DataFrame(
+            {"date": _as_utc(df.index), label: df.iloc[:, 0].to_numpy(dtype=float)}
+        )
+        aligned = pd.merge_asof(
+            left, right, on="date", direction="nearest", tolerance=tolerance
+        )
+        columns[label] = aligned[label].to_numpy()
+        currencies[label] = currency
+
+    panel = pd.DataFrame(columns, index=dates[order]).iloc[np.argsort(order)]
+    panel.index.name = "date"
+    return PricePanel(panel, currencies)
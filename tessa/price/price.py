@@ -1,28 +1,63 @@
 """Retrieve price information."""
 
 from __future__ import annotations
-from functools import lru_cache, wraps
-from typing import Union, TYPE_CHECKING
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
+import numpy as np
 import pandas as pd
 from . import PriceHistory, PricePoint
+from .types import SOURCE_ERRORS, CircuitOpenError
+from .cache import CacheKey, PriceCache
+from .coingecko import COMPLETED_CHUNKS
+from .retrieval import (
+    LATEST_PRICE_CACHE,
+    NEGATIVE_CACHE,
+    PRICE_CACHE,
+    as_timestamp,
+    cache_key,
+    hand_out,
+    latest_price_point,
+    look_up_store,
+    peek_expired,
+    price_point_from_history,
+    refresh_latest_price,
+    refresh_price_history,
+    remembering_failures,
+    retrieve_latest_price,
+    retrieve_price_history,
+    revalidate,
+    slice_history,
+    stale_price_history,
+    store_history,
+)
 from .. import sources
+from ..singleflight import SingleFlight
 
 if TYPE_CHECKING:
     from .. import SourceType
 
 
-def custom_cache_wrapper(func):
-    """To preserve the function's signature _and_ give access to `cache_clear` etc."""
-    cached_func = lru_cache(maxsize=None)(func)
-    wrapped_func = wraps(func)(cached_func)
-    return wrapped_func
+IN_FLIGHT = SingleFlight()
+"""Coalesces concurrent retrievals of the same price history or latest price, so only
+one request per key hits the source while the other callers wait for its result.
+"""
 
 
-@custom_cache_wrapper
 def price_history(
     query: str,
     source: SourceType = "yahoo",
     currency_preference: str = "USD",
+    copy: bool = True,
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+    deadline: Optional[float] = None,
 ) -> PriceHistory:
     """Get price history and return `PriceHistory`, i.e., a tuple of a dataframe with
     the price history and the effective currency. Note that the effective currency
@@ -34,15 +69,109 @@ def price_history(
     - `currency_preference`: The currency the prices should be returned in; defaults
       to "USD". The effective currency might differ and will be returned in the second
       return value.
+    - `copy`: Return a copy of the cached dataframe (the default), which the caller can
+      modify freely. Use `False` to avoid the copy if you only read the dataframe. You
+      will get a view whose data is read-only, so the cached original stays protected.
+    - `start`, `end`: Only return (and, if not cached yet, only retrieve) the prices
+      from `start` up to but excluding `end`. Both default to no limit, i.e., the full
+      history.
+    - `deadline`: Give up retrying rate limit hits and server-side errors after this
+      many seconds and raise a `tessa.price.types.RetryDeadlineExceededError` instead
+      (a `TimeoutError`). Defaults to the source's retry policy, see
+      `tessa.sources.retry`.
+
+    Results are cached in memory; use `price_history.cache_clear()` and
+    `price_history.cache_info()` to manage the cache. Permanent failures such as
+    unknown symbols are cached, too, see `tessa.price.retrieval.NEGATIVE_CACHE`. If the
+    cache has a soft time to live, stale histories are returned right away and
+    refreshed in the background (see `tessa.price.cache`). Concurrent calls for the
+    same history that miss the cache are coalesced into a single retrieval. The cache
+    is range-aware: A request for a narrower range is served from a cached wider range,
+    and a request for a wider range only retrieves the missing parts. If a persistent
+    store is set up (see `tessa.price.store`), a fresh enough history from the store
+    will be used instead of hitting the network. Stale histories are refreshed
+    incrementally if the store's freshness policy asks for it.
     """
+    start, end = as_timestamp(start), as_timestamp(end)
+    key = cache_key(query, source, currency_preference)
+    query, source, currency_preference = key
+    history = PRICE_CACHE.get(key, start, end)
+    if history is None:
+
+        def retrieve() -> PriceHistory:
+            try:
+                with remembering_failures(key):
+                    history, coverage = retrieve_price_history(
+                        query, source, currency_preference, start, end, deadline
+                    )
+            except CircuitOpenError as exc:
+                return stale_price_history(query, source, currency_preference, exc)
+            PRICE_CACHE.put(key, history, coverage)
+            return history
+
+        history = IN_FLIGHT.do(("history",) + key + (start, end), retrieve)
+    elif PRICE_CACHE.is_stale(key):
+        revalidate(("history",) + key, refresh_price_history, *key)
+    return hand_out(slice_history(history, start, end), copy)
+
+
+def _clear_caches(*caches: PriceCache) -> Callable[[], None]:
+    """Return a function that clears `caches` as well as the negative cache."""
+
+    def cache_clear() -> None:
+        for cache in caches:
+            cache.clear()
+        NEGATIVE_CACHE.clear()
+
+    return cache_clear
+
+
+price_history.cache_clear = _clear_caches(PRICE_CACHE, COMPLETED_CHUNKS)
+price_history.cache_info = PRICE_CACHE.info
+price_history.cache_keys = PRICE_CACHE.keys
+
+
+def price_history_many(
+    queries: Iterable[str],
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+    copy: bool = True,
+) -> Dict[str, PriceHistory]:
+    """Get the price histories for several queries from the same source at once and
+    return a dictionary mapping each query to its `PriceHistory`.
+
+    Uses the source's batch retrieval where available (currently Yahoo), which runs the
+    requests concurrently. Note that the source's rate limiter still bounds the
+    throughput, so this mostly saves the time spent waiting for responses. Fills the
+    same caches as `price_history`, including the negative cache for queries that
+    fail permanently. Other queries that fail in the batch are retried one by one via
+    `price_history`, which raises the usual errors. See `price_history` regarding
+    `copy`.
+    """
+    keys = {q: cache_key(q, source, currency_preference) for q in queries}
+    source, currency_preference = source.strip().lower(), currency_preference.upper()
     src = sources.get_source(source)
-    src.rate_limiter.rate_limit()
-    df, effective_currency = src.get_price_history_bruteforcefully(
-        query, currency_preference
-    )
-    return PriceHistory(df.copy(), effective_currency.upper())
-    # (Returning a copy of the dataframe so the cached original is preserved even if it
-    # gets modified by the caller.)
+
+    def needs_retrieval(key: CacheKey) -> bool:
+        if key in PRICE_CACHE or key in NEGATIVE_CACHE:
+            return False
+        fresh, _, _ = look_up_store(*key)
+        return fresh is None
+
+    # (Removes duplicates, keeps order:)
+    missing = [k.query for k in dict.fromkeys(keys.values()) if needs_retrieval(k)]
+    if src.get_price_histories is not None and missing:
+        retrieved = src.get_price_histories(missing, currency_preference)
+        for query, history in retrieved.items():
+            key = CacheKey(query, source, currency_preference)
+            if isinstance(history, Exception):
+                NEGATIVE_CACHE.put(key, history)
+                continue
+            history = PriceHistory(history.df, history.currency.upper())
+            store_history(query, source, currency_preference, history)
+            PRICE_CACHE.put(key, history)
+
+    return {q: price_history(*key, copy) for q, key in keys.items()}
 
 
 def price_point(
@@ -66,26 +195,77 @@ def price_point(
     price_point("AAPL", "2020-01-01")
     ```
     """
-    df, currency = price_history(query, source, currency_preference)
-
-    when = pd.Timestamp(when)
-    if df.index.tz is not None:  # Ensure when matches the timezone of df.index
-        when = when.tz_localize("UTC") if when.tz is None else when.tz_convert("UTC")
-
-    nearest_index = df.index.get_indexer([when], method="nearest")[0]
-    found_date = df.index[nearest_index]
-
-    if (
-        max_date_deviation_days is not None
-        and abs((found_date - when).days) > max_date_deviation_days
-    ):
-        raise ValueError(
-            f"Found date {found_date} is more than {max_date_deviation_days} days away "
-            f"from requested date {when}"
+    history = price_history(query, source, currency_preference, copy=False)
+    return price_point_from_history(history, when, max_date_deviation_days)
+
+
+def price_points(
+    query: str,
+    whens: Iterable[Union[str, pd.Timestamp]],
+    source: SourceType = "yahoo",
+    currency_preference: str = "USD",
+    max_date_deviation_days: Union[int, None] = 10,
+) -> pd.DataFrame:
+    """Vectorized version of `price_point` that looks up the prices for all the points
+    in time in `whens` (e.g., a list, a `pd.Series`, or a `pd.DatetimeIndex`) at once,
+    which is much faster than calling `price_point` for each of them.
+
+    Returns a dataframe indexed by the requested points in time (in the given order)
+    with the columns `when` (the effective timestamp of the price), `price`, and
+    `currency`. Instead of raising a `ValueError`, prices more than
+    `max_date_deviation_days` away from the requested point in time are reported as
+    missing values.
+
+    Example call:
+    ```
+    price_points("AAPL", pd.date_range("2020-01-01", "2020-12-31", freq="W"))
+    ```
+    """
+    history = price_history(query, source, currency_preference, copy=False)
+    return _price_points_from_history(history, whens, max_date_deviation_days)
+
+
+def _price_points_from_history(
+    history: PriceHistory,
+    whens: Iterable[Union[str, pd.Timestamp]],
+    max_date_deviation_days: Union[int, None],
+) -> pd.DataFrame:
+    """Look up the prices closest to each of `whens` in `history` in one sorted search.
+    See `price_points`.
+    """
+    df, currency = history
+    if not isinstance(whens, (pd.Index, pd.Series, np.ndarray)):
+        whens = list(whens)
+    whens = pd.DatetimeIndex(pd.to_datetime(whens, format="mixed"))
+    if df.index.tz is not None:  # Ensure whens match the timezone of df.index
+        whens = (
+            whens.tz_localize("UTC") if whens.tz is None else whens.tz_convert("UTC")
         )
+    whens.name = "requested"
 
-    price = df.iloc[nearest_index]
-    return PricePoint(when=found_date, price=float(price.iloc[0]), currency=currency)
+    if df.empty:
+        return pd.DataFrame(
+            {"when": pd.NaT, "price": np.nan, "currency": currency}, index=whens
+        )
+
+    # Pick the nearer of the two neighbors for each point in time; prefer the later one
+    # on ties, just like `get_indexer(..., method="nearest")` in `price_point` does:
+    dates = df.index
+    right = dates.searchsorted(whens).clip(0, len(dates) - 1)
+    left = (right - 1).clip(0, len(dates) - 1)
+    left_distance = np.abs((whens - dates[left]).to_numpy())
+    right_distance = np.abs((dates[right] - whens).to_numpy())
+    nearest = np.where(right_distance <= left_distance, right, left)
+
+    found = dates[nearest]
+    prices = df.iloc[:, 0].to_numpy(dtype=float)[nearest]
+    if max_date_deviation_days is not None:
+        too_far = np.abs((found - whens).days) > max_date_deviation_days
+        found = found.where(~too_far)
+        prices = np.where(too_far, np.nan, prices)
+    return pd.DataFrame(
+        {"when": found, "price": prices, "currency": currency}, index=whens
+    )
 
 
 def price_point_strict(
@@ -111,8 +291,90 @@ def price_latest(
     source: SourceType = "yahoo",
     currency_preference: str = "USD",
 ) -> PricePoint:
-    """Same as `price_point` but will return the latest price."""
-    df, currency = price_history(query, source, currency_preference)
-    return PricePoint(
-        when=df.iloc[-1].name, price=float(df.iloc[-1]["close"]), currency=currency
-    )
+    """Same as `price_point` but will return the latest price.
+
+    Uses the full history if it is cached already. Otherwise, only retrieves the latest
+    price (if the source supports that), which is much cheaper than retrieving the full
+    history, and caches it in `tessa.price.retrieval.LATEST_PRICE_CACHE`.
+    """
+    key = cache_key(query, source, currency_preference)
+    query, source, currency_preference = key
+    src = sources.get_source(source)
+    if key in PRICE_CACHE or src.get_latest_price is None:
+        history = price_history(query, source, currency_preference, copy=False)
+        return latest_price_point(history)
+    latest = LATEST_PRICE_CACHE.get(key)
+    if latest is None:
+
+        def retrieve() -> PriceHistory:
+            try:
+                return retrieve_latest_price(query, source, currency_preference)
+            except CircuitOpenError as exc:
+                return stale_price_history(
+                    query,
+                    source,
+                    currency_preference,
+                    exc,
+                    peek_expired(LATEST_PRICE_CACHE, key),
+                )
+
+        latest = IN_FLIGHT.do(("latest",) + key, retrieve)
+    elif LATEST_PRICE_CACHE.is_stale(key):
+        revalidate(("latest",) + key, refresh_latest_price, *key)
+    return latest_price_point(latest)
+
+
+def price_latest_many(
+    queries: Iterable[str],
+    source: SourceType = "yahoo",
+    currency_preferences: Union[str, Iterable[str]] = "USD",
+) -> Dict[Tuple[str, str], PricePoint]:
+    """Get the latest prices for several queries from the same source -- in one or
+    several currencies -- at once and return a dictionary mapping each (query, currency
+    preference) pair to its `PricePoint`.
+
+    Uses the source's batch retrieval where available (currently Coingecko), which gets
+    all the prices with a single request (or very few). Fills the same caches as
+    `price_latest`. Queries that fail in the batch -- or all of them if the batch
+    retrieval fails as a whole -- are retried one by one via `price_latest`, which
+    raises the usual errors. Errors that concern the source as a whole (see
+    `tessa.price.types.SOURCE_ERRORS`) are raised right away instead.
+    """
+    if isinstance(currency_preferences, str):
+        currency_preferences = [currency_preferences]
+    keys = {
+        (q, c): cache_key(q, source, c) for q in queries for c in currency_preferences
+    }
+    source = source.strip().lower()
+    src = sources.get_source(source)
+
+    missing = [
+        key
+        for key in dict.fromkeys(keys.values())  # (Removes duplicates, keeps order.)
+        if key not in PRICE_CACHE
+        and LATEST_PRICE_CACHE.peek(key) is None
+        and key not in NEGATIVE_CACHE
+    ]
+    if src.get_latest_prices is not None and missing:
+        src.rate_limiter.rate_limit()
+        try:
+            retrieved = src.get_latest_prices_bruteforcefully(
+                list(dict.fromkeys(k.query for k in missing)),
+                list(dict.fromkeys(k.currency_preference for k in missing)),
+            )
+        except SOURCE_ERRORS:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            retrieved = {}
+        for (query, currency_preference), (df, currency) in retrieved.items():
+            LATEST_PRICE_CACHE.put(
+                CacheKey(query, source, currency_preference),
+                PriceHistory(df, currency.upper()),
+            )
+
+    return {pair: price_latest(*key) for pair, key in keys.items()}
+
+
+price_latest.cache_clear = _clear_caches(LATEST_PRICE_CACHE)
+price_latest.cache_info = LATEST_PRICE_CACHE.info
+price_latest.cache_keys = LATEST_PRICE_CACHE.keys
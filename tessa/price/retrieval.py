@@ -0,0 +1,446 @@
+"""The retrieval machinery shared by the price functions in `tessa.price.price` and
+their asynchronous counterparts in `tessa.aio`: The in-memory caches, planning and
+completing retrievals, and refreshing stale entries in the background.
+"""
+
+from __future__ import annotations
+from typing import (
+    Callable,
+    Hashable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from .types import CircuitOpenError, PriceHistory, PricePoint
+from .cache import (
+    FULL_COVERAGE,
+    PERMANENT_ERRORS,
+    CacheKey,
+    Coverage,
+    NegativeCache,
+    PriceCache,
+    missing_segments,
+    union,
+)
+from .store import FreshnessPolicy, StoredPriceHistory, get_price_store
+from .. import sources
+from ..sources.retry import RetryPolicy
+
+if TYPE_CHECKING:
+    from .. import SourceType
+    from ..sources import Source
+
+
+PRICE_CACHE = PriceCache()
+"""The in-memory cache for price histories, shared by all price functions."""
+
+LATEST_PRICE_CACHE = PriceCache(ttl_seconds=60)
+"""The in-memory cache for latest prices retrieved without the full history (see
+`tessa.price.price.price_latest`). Kept separate from `PRICE_CACHE` and with a short
+time to live, so latest prices stay current.
+"""
+
+NEGATIVE_CACHE = NegativeCache()
+"""The in-memory cache for permanent failures such as unknown symbols, shared by all
+price functions (see `tessa.price.cache`).
+"""
+
+REVALIDATION_DEADLINE = 60.0
+"""Seconds after which background refreshes give up retrying (see
+`tessa.sources.retry`), so a struggling source can't tie up the refresh threads (or
+delay exiting) for long.
+"""
+
+_REVALIDATION_POOL = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="tessa-revalidate"
+)
+_REVALIDATING: Set[Hashable] = set()
+_REVALIDATION_LOCK = threading.Lock()
+
+
+def cache_key(query: str, source: SourceType, currency_preference: str) -> CacheKey:
+    """Return the canonical key for a request, which all price caching uses, so
+    equivalent requests share one cache entry: The source's name in lower case, the
+    query as normalized by the source (see `tessa.sources.sources.Source`), and the
+    currency preference in upper case.
+    """
+    source = source.strip().lower()
+    src = sources.get_source(source)
+    return CacheKey(
+        src.normalize_query(query), source, currency_preference.strip().upper()
+    )
+
+
+def merge_price_histories(older: pd.DataFrame, newer: pd.DataFrame) -> pd.DataFrame:
+    """Merge two price dataframes. Prices from `newer` take precedence within the range
+    `newer` covers.
+    """
+    if newer.empty:
+        return older
+    outside = (older.index < newer.index[0]) | (older.index > newer.index[-1])
+    return pd.concat([older[outside], newer]).sort_index()
+
+
+@contextmanager
+def remembering_failures(key: Hashable) -> Iterator[None]:
+    """Raise the failure remembered for `key` in `NEGATIVE_CACHE` right away if there
+    is one; otherwise run the block and remember it if it fails permanently.
+    """
+    failure = NEGATIVE_CACHE.get(key)
+    if failure is not None:
+        raise failure.with_traceback(None)
+    try:
+        yield
+    except PERMANENT_ERRORS as exc:
+        NEGATIVE_CACHE.put(key, exc)
+        raise
+
+
+def look_up_store(
+    query: str, source: SourceType, currency_preference: str
+) -> Tuple[
+    Optional[PriceHistory], Optional[StoredPriceHistory], Optional[pd.Timestamp]
+]:
+    """Look up the persistent store (if any). Returns a tuple of 1) the stored history
+    if it is fresh enough to be used as is, 2) the stale stored history otherwise, and
+    3) the date to start retrieving from if the stale history is to be refreshed
+    incrementally.
+    """
+    store = get_price_store()
+    stored = None if store is None else store.get(source, query, currency_preference)
+    if stored is None:
+        return None, None, None
+    if store.freshness.is_fresh(stored):
+        return stored.history, None, None
+    start = None
+    if store.freshness.incremental and not stored.history.df.empty:
+        overlap = pd.Timedelta(days=store.freshness.overlap_days)
+        start = stored.history.df.index[-1] - overlap
+    return None, stored, start
+
+
+def as_timestamp(value: Optional[Union[str, pd.Timestamp]]) -> Optional[pd.Timestamp]:
+    """Turn a `start` or `end` argument into a UTC timestamp (or leave it at `None`)."""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tz is None else value.tz_convert("UTC")
+
+
+def slice_history(
+    history: PriceHistory, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]
+) -> PriceHistory:
+    """Cut `history` down to the range from `start` to `end` (exclusive)."""
+    if start is None and end is None:
+        return history
+    df = history.df
+    index = df.index if df.index.tz is not None else df.index.tz_localize("UTC")
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= index >= start
+    if end is not None:
+        keep &= index < end
+    return PriceHistory(df[keep], history.currency)
+
+
+RetrievalPlan = NamedTuple(
+    "RetrievalPlan",
+    [
+        ("ready", Optional[PriceHistory]),
+        ("base", Optional[PriceHistory]),
+        ("segments", List[Coverage]),
+        ("coverage", Coverage),
+    ],
+)
+"""What needs to be done to satisfy a price history request that missed the cache:
+Either a history that is `ready` to be used as is, or the date range `segments` to be
+retrieved from the source and merged into `base` (if any), which will then cover
+`coverage`.
+"""
+
+
+def plan_retrieval(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    refresh: bool = False,
+) -> RetrievalPlan:
+    """Work out how to retrieve the history from `start` to `end` with as little
+    network traffic as possible: Use a fresh history from the persistent store if there
+    is one, otherwise only retrieve what's missing from the cached history. If the
+    cached history is expired or to be `refresh`ed, only retrieve its tail (see
+    `_refresh_overlap`) plus what's missing. Failing that, for full histories, only
+    retrieve the tail of a stale stored history that is to be refreshed incrementally.
+    """
+    fresh, stale, incremental_start = look_up_store(query, source, currency_preference)
+    if fresh is not None:
+        return RetrievalPlan(fresh, None, [], FULL_COVERAGE)
+    key = CacheKey(query, source, currency_preference)
+    cached = None if refresh else PRICE_CACHE.peek(key)
+    if cached is None:
+        outdated = PRICE_CACHE.peek(key, expired=True)
+        if (
+            outdated is not None
+            and outdated.coverage[1] is None
+            and not outdated.history.df.empty
+        ):
+            tail_start = outdated.history.df.index[-1] - _refresh_overlap()
+            if outdated.coverage[0] is not None:
+                tail_start = max(tail_start, outdated.coverage[0])
+            return RetrievalPlan(
+                None,
+                outdated.history,
+                missing_segments(outdated.coverage, start, end) + [(tail_start, None)],
+                union(outdated.coverage, start, end),
+            )
+    if cached is not None:
+        return RetrievalPlan(
+            None,
+            cached.history,
+            missing_segments(cached.coverage, start, end),
+            union(cached.coverage, start, end),
+        )
+    if start is None and end is None and incremental_start is not None:
+        return RetrievalPlan(
+            None, stale.history, [(incremental_start, None)], FULL_COVERAGE
+        )
+    return RetrievalPlan(None, None, [(start, end)], (start, end))
+
+
+def _refresh_overlap() -> pd.Timedelta:
+    """How far before the latest cached price to start retrieving when refreshing a
+    cached history: The persistent store's `overlap_days` (or the default if there is no
+    store), so revised closes are picked up.
+    """
+    store = get_price_store()
+    freshness = FreshnessPolicy() if store is None else store.freshness
+    return pd.Timedelta(days=freshness.overlap_days)
+
+
+def complete_retrieval(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    plan: RetrievalPlan,
+    retrieved: List[PriceHistory],
+) -> PriceHistory:
+    """Merge the histories `retrieved` for the `plan`'s segments into its base and
+    write the result to the persistent store (if any and if it's a full history).
+    """
+    history = plan.base
+    for df, effective_currency in retrieved:
+        if history is not None:
+            df = merge_price_histories(history.df, df)
+        history = PriceHistory(df, effective_currency.upper())
+    if plan.coverage == FULL_COVERAGE:
+        store_history(query, source, currency_preference, history)
+    return history
+
+
+def store_history(
+    query: str, source: SourceType, currency_preference: str, history: PriceHistory
+) -> None:
+    """Write a full history to the persistent store (if any)."""
+    store = get_price_store()
+    if store is not None:
+        store.put(source, query, currency_preference, history)
+
+
+def deadline_retry_policy(
+    src: Source, deadline: Optional[float]
+) -> Optional[RetryPolicy]:
+    """Return the source's retry policy with `deadline` or `None` to just use the
+    source's policy.
+    """
+    return None if deadline is None else replace(src.retry_policy, deadline=deadline)
+
+
+def retrieve_price_history(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    start: Optional[pd.Timestamp] = None,
+    end: Optional[pd.Timestamp] = None,
+    deadline: Optional[float] = None,
+    refresh: bool = False,
+) -> Tuple[PriceHistory, Coverage]:
+    """Retrieve a price history from the persistent store (if there is one and the
+    history is fresh enough) or from the source itself, see `plan_retrieval`. Returns
+    the history and the date range it covers.
+    """
+    src = sources.get_source(source)
+    retry_policy = deadline_retry_policy(src, deadline)
+    plan = plan_retrieval(query, source, currency_preference, start, end, refresh)
+    if plan.ready is not None:
+        return plan.ready, plan.coverage
+    retrieved = []
+    for segment_start, segment_end in plan.segments:
+        src.rate_limiter.rate_limit()
+        retrieved.append(
+            src.get_price_history_bruteforcefully(
+                query,
+                currency_preference,
+                start=segment_start,
+                end=segment_end,
+                retry_policy=retry_policy,
+            )
+        )
+    history = complete_retrieval(query, source, currency_preference, plan, retrieved)
+    return history, plan.coverage
+
+
+def refresh_price_history(
+    query: str, source: SourceType, currency_preference: str
+) -> None:
+    """Retrieve a cached history again -- covering the same range -- and replace the
+    cached one. Only retrieves the tail of histories that reach up to now, see
+    `plan_retrieval`.
+    """
+    key = CacheKey(query, source, currency_preference)
+    cached = PRICE_CACHE.peek(key, expired=True)
+    coverage = FULL_COVERAGE if cached is None else cached.coverage
+    with remembering_failures(key):
+        history, coverage = retrieve_price_history(
+            *key, *coverage, deadline=REVALIDATION_DEADLINE, refresh=True
+        )
+    PRICE_CACHE.put(key, history, coverage)
+
+
+def refresh_latest_price(
+    query: str, source: SourceType, currency_preference: str
+) -> None:
+    """Retrieve a cached latest price again and replace the cached one."""
+    retrieve_latest_price(query, source, currency_preference, REVALIDATION_DEADLINE)
+
+
+def revalidate(flight_key: Hashable, refresh: Callable, *args) -> None:
+    """Call `refresh` with `args` in the background (stale-while-revalidate), unless a
+    refresh with the same `flight_key` is running or scheduled already.
+    """
+    with _REVALIDATION_LOCK:
+        if flight_key in _REVALIDATING:
+            return
+        _REVALIDATING.add(flight_key)
+
+    def run() -> None:
+        try:
+            refresh(*args)
+        except Exception as exc:  # pylint: disable=broad-except
+            warnings.warn(f"Background refresh failed: {exc}", RuntimeWarning)
+        finally:
+            with _REVALIDATION_LOCK:
+                _REVALIDATING.discard(flight_key)
+
+    _REVALIDATION_POOL.submit(run)
+
+
+def peek_expired(cache: PriceCache, key: CacheKey) -> Optional[PriceHistory]:
+    """Return the history cached for `key`, even if it is expired, or `None`."""
+    entry = cache.peek(key, expired=True)
+    return None if entry is None else entry.history
+
+
+def stale_price_history(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    exc: CircuitOpenError,
+    fallback: Optional[PriceHistory] = None,
+) -> PriceHistory:
+    """Return whatever history there is for the query -- even if it is expired, stale,
+    or doesn't cover the requested range -- while the source's circuit breaker is open
+    (as indicated by `exc`). Reraises `exc` if there is none. Prefers `fallback` if
+    given.
+    """
+    history = fallback
+    if history is None:
+        history = peek_expired(
+            PRICE_CACHE, CacheKey(query, source, currency_preference)
+        )
+    if history is None:
+        store = get_price_store()
+        stored = (
+            None if store is None else store.get(source, query, currency_preference)
+        )
+        if stored is None:
+            raise exc
+        history = stored.history
+    warnings.warn(f"{exc} Using a stale price history instead.", RuntimeWarning)
+    return history
+
+
+def hand_out(history: PriceHistory, copy: bool) -> PriceHistory:
+    """Return a cached history to a caller: Either as a copy or as a shallow view of
+    the read-only cached dataframe, so the cached original stays protected either way.
+    """
+    return PriceHistory(history.df.copy(deep=copy), history.currency)
+
+
+def price_point_from_history(
+    history: PriceHistory,
+    when: Union[str, pd.Timestamp],
+    max_date_deviation_days: Union[int, None],
+) -> PricePoint:
+    """Look up the price closest to `when` in `history`. See
+    `tessa.price.price.price_point`.
+    """
+    df, currency = history
+    when = pd.Timestamp(when)
+    if df.index.tz is not None:  # Ensure when matches the timezone of df.index
+        when = when.tz_localize("UTC") if when.tz is None else when.tz_convert("UTC")
+
+    nearest_index = df.index.get_indexer([when], method="nearest")[0]
+    found_date = df.index[nearest_index]
+
+    if (
+        max_date_deviation_days is not None
+        and abs((found_date - when).days) > max_date_deviation_days
+    ):
+        raise ValueError(
+            f"Found date {found_date} is more than {max_date_deviation_days} days away "
+            f"from requested date {when}"
+        )
+
+    price = df.iloc[nearest_index]
+    return PricePoint(when=found_date, price=float(price.iloc[0]), currency=currency)
+
+
+def retrieve_latest_price(
+    query: str,
+    source: SourceType,
+    currency_preference: str,
+    deadline: Optional[float] = None,
+) -> PriceHistory:
+    """Retrieve the latest price (only) and cache it in `LATEST_PRICE_CACHE`."""
+    key = CacheKey(query, source, currency_preference)
+    src = sources.get_source(source)
+    with remembering_failures(key):
+        src.rate_limiter.rate_limit()
+        df, effective_currency = src.get_latest_price_bruteforcefully(
+            query, currency_preference, deadline_retry_policy(src, deadline)
+        )
+    latest = PriceHistory(df, effective_currency.upper())
+    LATEST_PRICE_CACHE.put(key, latest)
+    return latest
+
+
+def latest_price_point(history: PriceHistory) -> PricePoint:
+    """Return the latest price in `history`."""
+    df, currency = history
+    return PricePoint(
+        when=df.iloc[-1].name, price=float(df.iloc[-1]["close"]), currency=currency
+    )
@@ -0,0 +1,119 @@
+"""Cache snapshots -- export the in-memory price cache to a file and import it somewhere
+else. E.g., build the cache in a nightly job and ship it to all serving nodes, so they
+start with a warm cache and don't need to hit the network:
+
+```python
+from tessa.price import cache_export, cache_import
+cache_export("prices.parquet")  # In the nightly job, after retrieving all histories
+cache_import("prices.parquet")  # At the start of each node
+```
+
+A snapshot is a single Parquet file with one row per price and the columns listed in
+`SNAPSHOT_COLUMNS`. Entries keep their age, i.e., the time they were retrieved: They
+expire on the importing node when they would have expired on the exporting node (see
+`tessa.price.cache`).
+
+Snapshots require `pyarrow`, which comes with the `snapshot` extra: `pip install
+tessa[snapshot]`.
+"""
+
+from typing import List, Optional
+import time
+import pandas as pd
+from .types import PriceHistory
+from .cache import CacheKey, Coverage
+from .retrieval import PRICE_CACHE
+
+SNAPSHOT_COLUMNS = [
+    "query",
+    "source",
+    "currency_preference",
+    "currency",
+    "fetched_at",
+    "coverage_start",
+    "coverage_end",
+    "date",
+    "close",
+]
+"""The columns of a snapshot file. An empty history is represented by a single row
+without `date` and `close`.
+"""
+
+
+def _to_rows(
+    key: CacheKey, history: PriceHistory, coverage: Coverage, fetched_at: pd.Timestamp
+) -> pd.DataFrame:
+    """Turn a cached history into snapshot rows."""
+    df = history.df
+    coverage_start, coverage_end = coverage
+    return pd.DataFrame(
+        {
+            "query": key.query,
+            "source": key.source,
+            "currency_preference": key.currency_preference,
+            "currency": history.currency,
+            "fetched_at": fetched_at,
+            "coverage_start": pd.NaT if coverage_start is None else coverage_start,
+            "coverage_end": pd.NaT if coverage_end is None else coverage_end,
+            "date": df.index if len(df) else [pd.NaT],
+            "close": df["close"].to_numpy() if len(df) else [float("nan")],
+        },
+        columns=SNAPSHOT_COLUMNS,
+    )
+
+
+def cache_export(path: str) -> int:
+    """Write all (unexpired) price histories in the cache to a snapshot file at `path`.
+    Returns the number of histories written.
+    """
+    now, monotonic_now = pd.Timestamp.now("UTC"), time.monotonic()
+    frames: List[pd.DataFrame] = []
+    for key in PRICE_CACHE.keys():
+        entry = PRICE_CACHE.peek(key)
+        if entry is None:  # (Expired in the meantime.)
+            continue
+        fetched_at = now - pd.Timedelta(seconds=monotonic_now - entry.stored_at)
+        frames.append(
+            _to_rows(CacheKey(*key), entry.history, entry.coverage, fetched_at)
+        )
+    if frames:
+        snapshot = pd.concat(frames, ignore_index=True)
+    else:
+        snapshot = pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    for column in ["fetched_at", "coverage_start", "coverage_end", "date"]:
+        snapshot[column] = pd.to_datetime(snapshot[column], utc=True)
+    snapshot["close"] = snapshot["close"].astype(float)
+    snapshot.to_parquet(path, index=False)
+    return len(frames)
+
+
+def _as_bound(value: pd.Timestamp) -> Optional[pd.Timestamp]:
+    return None if pd.isna(value) else value
+
+
+def cache_import(path: str) -> int:
+    """Load the price histories from the snapshot file at `path` into the cache. Skips
+    histories that are expired already or older than the ones in the cache. Returns
+    the number of histories loaded.
+    """
+    snapshot = pd.read_parquet(path)
+    now = pd.Timestamp.now("UTC")
+    count = 0
+    keys = ["query", "source", "currency_preference"]
+    for key, rows in snapshot.groupby(keys, sort=False):
+        key = CacheKey(*key)
+        first = rows.iloc[0]
+        age = max(0.0, (now - first["fetched_at"]).total_seconds())
+        if PRICE_CACHE.ttl_seconds is not None and age > PRICE_CACHE.ttl_seconds:
+            continue
+        cached = PRICE_CACHE.peek(key)
+        if cached is not None and time.monotonic() - cached.stored_at < age:
+            continue
+        df = rows.dropna(subset=["date"]).set_index("date")[["close"]]
+        coverage = (
+            _as_bound(first["coverage_start"]),
+            _as_bound(first["coverage_end"]),
+        )
+        PRICE_CACHE.put(key, PriceHistory(df, first["currency"]), coverage, age)
+        count += 1
+    return count
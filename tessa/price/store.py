@@ -0,0 +1,198 @@
+"""Persistent price history stores -- keep retrieved price histories around across
+process restarts so a cold start doesn't have to download everything again.
+
+By default, no store is used and tessa only caches in memory. To use a store, set one
+up once at the start of your program:
+
+```python
+from tessa.price.store import SQLitePriceStore, FreshnessPolicy, set_price_store
+set_price_store(SQLitePriceStore("prices.sqlite", FreshnessPolicy(max_age_hours=6)))
+```
+
+`tessa.price.price.price_history` will then consult the store before it hits the
+network and write every newly retrieved history back to the store. Use
+`FreshnessPolicy(incremental=True)` to only retrieve the missing tail of stale
+histories instead of the full history.
+
+Stores are pluggable: Subclass `PriceStore` and implement `get`, `put`, and `clear` to
+keep histories somewhere else.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass
+from typing import NamedTuple, Optional, TYPE_CHECKING
+import os
+import sqlite3
+import pandas as pd
+import pendulum
+from .types import PriceHistory
+
+if TYPE_CHECKING:
+    from ..sources.sourcetype import SourceType
+
+
+StoredPriceHistory = NamedTuple(
+    "StoredPriceHistory",
+    [("history", PriceHistory), ("fetched_at", pendulum.DateTime)],
+)
+"""A price history as kept in a store, together with the time it was retrieved."""
+
+
+@dataclass
+class FreshnessPolicy:
+    """Decides whether a stored price history can be used as is or needs to be
+    retrieved again.
+    """
+
+    max_age_hours: float = 12
+    """Stored histories older than this are considered stale."""
+
+    incremental: bool = False
+    """Refresh stale histories incrementally, i.e., only retrieve the tail since the
+    latest stored price and merge it into the stored history. Note that this will not
+    pick up any adjustments to older prices (e.g., due to splits or dividends on Yahoo)
+    unless they fall into the overlap window.
+    """
+
+    overlap_days: int = 7
+    """When refreshing incrementally, retrieve this many days before the latest stored
+    price again so revised closes are picked up.
+    """
+
+    def is_fresh(self, stored: StoredPriceHistory) -> bool:
+        """Check if `stored` is recent enough to be used without hitting the network."""
+        age = pendulum.now() - stored.fetched_at
+        return age.total_seconds() <= self.max_age_hours * 60 * 60
+
+
+class PriceStore(ABC):
+    """Base class for persistent price history stores. Entries are keyed by source,
+    query, and currency preference.
+    """
+
+    freshness: FreshnessPolicy
+
+    def __init__(self, freshness: Optional[FreshnessPolicy] = None) -> None:
+        self.freshness = freshness or FreshnessPolicy()
+
+    @abstractmethod
+    def get(
+        self, source: SourceType, query: str, currency_preference: str
+    ) -> Optional[StoredPriceHistory]:
+        """Return the stored history or `None` if there is none."""
+
+    @abstractmethod
+    def put(
+        self,
+        source: SourceType,
+        query: str,
+        currency_preference: str,
+        history: PriceHistory,
+        fetched_at: Optional[pendulum.DateTime] = None,
+    ) -> None:
+        """Store `history`, replacing any previously stored history for the same key.
+        `fetched_at` defaults to now.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove all stored histories."""
+
+
+class SQLitePriceStore(PriceStore):
+    """Keeps price histories in a SQLite database file. Uses a new connection for every
+    operation, so a store can be shared between threads and processes.
+    """
+
+    path: str
+    """Path to the database file. Will be created if it doesn't exist."""
+
+    def __init__(self, path: str, freshness: Optional[FreshnessPolicy] = None) -> None:
+        super().__init__(freshness)
+        self.path = os.path.expanduser(path)
+        with closing(sqlite3.connect(self.path)) as con, con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS histories ("
+                " source TEXT, query TEXT, currency_preference TEXT,"
+                " currency TEXT NOT NULL, fetched_at TEXT NOT NULL,"
+                " PRIMARY KEY (source, query, currency_preference))"
+            )
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS prices ("
+                " source TEXT, query TEXT, currency_preference TEXT,"
+                " date INTEGER, close REAL,"
+                " PRIMARY KEY (source, query, currency_preference, date))"
+            )
+
+    def get(
+        self, source: SourceType, query: str, currency_preference: str
+    ) -> Optional[StoredPriceHistory]:
+        key = (source, query, currency_preference)
+        where = "WHERE source = ? AND query = ? AND currency_preference = ?"
+        with closing(sqlite3.connect(self.path)) as con:
+            row = con.execute(
+                f"SELECT currency, fetched_at FROM histories {where}", key
+            ).fetchone()
+            if row is None:
+                return None
+            prices = con.execute(
+                f"SELECT date, close FROM prices {where} ORDER BY date", key
+            ).fetchall()
+        currency, fetched_at = row
+        df = pd.DataFrame(
+            {"close": [close for _, close in prices]},
+            index=pd.to_datetime([date for date, _ in prices], unit="ns", utc=True),
+            dtype="float64",
+        )
+        df.index.name = "date"
+        return StoredPriceHistory(
+            PriceHistory(df, currency), pendulum.parse(fetched_at)
+        )
+
+    def put(
+        self,
+        source: SourceType,
+        query: str,
+        currency_preference: str,
+        history: PriceHistory,
+        fetched_at: Optional[pendulum.DateTime] = None,
+    ) -> None:
+        key = (source, query, currency_preference)
+        where = "WHERE source = ? AND query = ? AND currency_preference = ?"
+        df, currency = history
+        index = df.index if df.index.tz is not None else df.index.tz_localize("UTC")
+        rows = zip(index.as_unit("ns").asi8.tolist(), df["close"].astype(float))
+        fetched_at = fetched_at or pendulum.now()
+        with closing(sqlite3.connect(self.path)) as con, con:
+            con.execute(f"DELETE FROM prices {where}", key)
+            con.executemany(
+                "INSERT INTO prices VALUES (?, ?, ?, ?, ?)",
+                (key + (date, close) for date, close in rows),
+            )
+            con.execute(
+                "INSERT OR REPLACE INTO histories VALUES (?, ?, ?, ?, ?)",
+                key + (currency, fetched_at.isoformat()),
+            )
+
+    def clear(self) -> None:
+        with closing(sqlite3.connect(self.path)) as con, con:
+            con.execute("DELETE FROM prices")
+            con.execute("DELETE FROM histories")
+
+
+_price_store: Optional[PriceStore] = None
+
+
+def set_price_store(store: Optional[PriceStore]) -> None:
+    """Set the store to be used by the price functions. Use `None` to not use a
+    persistent store at all (the default).
+    """
+    global _price_store  # pylint: disable=global-statement
+    _price_store = store
+
+
+def get_price_store() -> Optional[PriceStore]:
+    """Return the store currently in use or `None`."""
+    return _price_store
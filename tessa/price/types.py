@@ -29,3 +29,22 @@ class RateLimitHitError(Exception):
     def __init__(self, source: SourceType, *args, **kwargs):
         msg = f"Rate limit hit on source '{source}'."
         super().__init__(msg, *args, **kwargs)
+
+
+class RetryDeadlineExceededError(TimeoutError):
+    def __init__(self, deadline: float, *args, **kwargs):
+        msg = f"Gave up retrying after exceeding the deadline of {deadline:g} seconds."
+        super().__init__(msg, *args, **kwargs)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, failures: int, retry_in: float, *args, **kwargs):
+        msg = (
+            f"Source failed {failures} times in a row; failing fast for another "
+            f"{retry_in:.0f} seconds."
+        )
+        super().__init__(msg, *args, **kwargs)
+
+
+SOURCE_ERRORS = (RateLimitHitError, CircuitOpenError, RetryDeadlineExceededError)
+"""Errors that concern a source as a whole rather than a single query."""
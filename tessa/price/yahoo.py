@@ -1,9 +1,22 @@
 """Everything Yahoo-Finance-related (other than search)."""
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
 import pandas as pd
 import yfinance as yf
-from yfinance.exceptions import YFRateLimitError
-from .types import PriceHistory, RateLimitHitError
+from yfinance.exceptions import (
+    YFPricesMissingError,
+    YFRateLimitError,
+    YFTickerMissingError,
+    YFTzMissingError,
+)
+from .cache import PERMANENT_ERRORS
+from .types import (
+    SOURCE_ERRORS,
+    PriceHistory,
+    RateLimitHitError,
+    SymbolNotFoundError,
+)
 
 # Ensure yfinance raises exceptions instead of silently failing
 yf.config.debug.hide_exceptions = False
@@ -13,19 +26,58 @@ START_FROM = "2000-01-01"
 extending this date will lead to increased load on the Yahoo Finance servers.
 """
 
+MAX_CONCURRENT_REQUESTS = 8
+"""Maximum number of requests `get_price_histories` will have in flight at once."""
 
-def get_price_history(
-    query: str, currency_preference: str = "USD"  # pylint: disable=unused-argument
-) -> PriceHistory:
-    """Get price history for a given query. Note that `currency_preference` will be
-    ignored since Yahoo Finance returns each ticker in the one currency that is set for
-    that ticker.
+
+LATEST_PERIOD = "5d"
+"""Period to retrieve for the latest price -- long enough to span weekends and
+holidays.
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Return the canonical form of `query`. (Yahoo Finance tickers are
+    case-insensitive.)
+    """
+    return query.strip().upper()
+
+
+def _ensure_session() -> None:
+    """Make sure the Yahoo source's shared HTTP session exists, which makes yfinance
+    use it, see `tessa.sources.http_session.yfinance_session`.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..sources import get_source  # (Late import to prevent circular imports.)
+
+    get_source("yahoo").http_session.get()
+
+
+def _get_history(query: str, full: bool = False, **history_args) -> PriceHistory:
+    """Retrieve a ticker's history via `yf.Ticker.history`, which gets passed
+    `history_args`, and turn it into a `PriceHistory`.
+
+    Raises a `SymbolNotFoundError` for unknown tickers. Missing prices only count as an
+    unknown ticker if the `full` history was requested and Yahoo didn't fail with an
+    HTTP error; a shorter range may just lack trades (e.g., a weekend) and results in
+    an empty history.
     """
     try:
+        _ensure_session()
         ticker = yf.Ticker(query)
-        df = ticker.history(start=START_FROM)
+        df = ticker.history(**history_args)
     except YFRateLimitError as exc:
         raise RateLimitHitError(source="yahoo") from exc
+    except YFPricesMissingError as exc:
+        if "status_code" in str(exc):
+            raise
+        if full:
+            raise SymbolNotFoundError(source="yahoo", query=query) from exc
+        if "currency" not in (ticker._price_history._history_metadata or {}):
+            raise
+        df = pd.DataFrame({"Close": []}, index=pd.DatetimeIndex([]), dtype=float)
+    except (YFTzMissingError, YFTickerMissingError) as exc:
+        raise SymbolNotFoundError(source="yahoo", query=query) from exc
 
     # Simplify dataframe:
     df = df.copy()
@@ -40,3 +92,81 @@ def get_price_history(
     # TODO Revert to get_history_metadata() once the issue is fixed in yfinance.
     currency = ticker._price_history._history_metadata["currency"]
     return PriceHistory(df, currency)
+
+
+def get_price_history(
+    query: str,
+    currency_preference: str = "USD",  # pylint: disable=unused-argument
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+) -> PriceHistory:
+    """Get price history for a given query. Note that `currency_preference` will be
+    ignored since Yahoo Finance returns each ticker in the one currency that is set for
+    that ticker.
+
+    Use `start` and `end` (exclusive) to only retrieve the history within that range;
+    `start` defaults to `START_FROM`, `end` to now.
+    """
+    return _get_history(
+        query, full=start is None and end is None, start=start or START_FROM, end=end
+    )
+
+
+def get_latest_price(
+    query: str, currency_preference: str = "USD"  # pylint: disable=unused-argument
+) -> PriceHistory:
+    """Get the latest price for a given query as a `PriceHistory` with a single row.
+    Only retrieves the last few days instead of the full history -- unless the ticker
+    hasn't traded within those days (e.g., b/c it is illiquid or suspended), in which
+    case the latest price from the full history is returned.
+    """
+    try:
+        df, currency = _get_history(query, period=LATEST_PERIOD)
+    except YFPricesMissingError:
+        df = None
+    if df is None or df.empty:
+        df, currency = get_price_history(query, currency_preference)
+    return PriceHistory(df.iloc[-1:], currency)
+
+
+def get_price_histories(
+    queries: List[str], currency_preference: str = "USD"
+) -> Dict[str, Union[PriceHistory, Exception]]:
+    """Get price histories for several queries at once. Returns a dictionary mapping
+    each query to its `PriceHistory` or, if it failed permanently (see
+    `tessa.price.cache.PERMANENT_ERRORS`), to the error; queries that fail otherwise
+    are left out.
+
+    Yahoo Finance has no multi-ticker history endpoint -- `yf.download` just requests
+    the tickers one by one, too -- so this requests the tickers concurrently, keeping
+    each ticker's currency. Every request goes through the Yahoo source's rate limiter,
+    circuit breaker, and retry policy, so the rate limiter bounds the throughput: With
+    the default of one request every 0.5 seconds, 3,000 tickers take 25 minutes.
+    Errors that concern the source rather than a single ticker (see
+    `tessa.price.types.SOURCE_ERRORS`) abort the batch.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..sources import get_source  # (Late import to prevent circular imports.)
+
+    src = get_source("yahoo")
+
+    def get_one(query: str) -> Optional[Union[PriceHistory, Exception]]:
+        src.rate_limiter.rate_limit()
+        try:
+            return src.get_price_history_bruteforcefully(query, currency_preference)
+        except SOURCE_ERRORS:
+            raise
+        except PERMANENT_ERRORS as exc:
+            return exc
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        futures = [executor.submit(get_one, q) for q in queries]
+        try:
+            results = [future.result() for future in futures]
+        except SOURCE_ERRORS:
+            for future in futures:
+                future.cancel()
+            raise
+        return {q: res for q, res in zip(queries, results) if res is not None}
@@ -1,17 +1,24 @@
 """Everything related to searching via coingecko."""
 
 import functools
-from pycoingecko import CoinGeckoAPI
+from ..price.coingecko import get_api
 from ..symbol import Symbol
+from ..singleflight import SingleFlight
 from . import SearchResult
 
+_IN_FLIGHT = SingleFlight()
+
 
 @functools.lru_cache(maxsize=None)
+def _retrieve_symbol_map() -> list:
+    return get_api().get_coins_list()
+
+
 def get_symbol_map() -> list:
     """Get the symbol map. Separate function to use caching, so the API doesn't get
-    hit too often.
+    hit too often. Concurrent first calls share a single retrieval.
     """
-    return CoinGeckoAPI().get_coins_list()
+    return _IN_FLIGHT.do("symbol_map", _retrieve_symbol_map)
 
 
 def _matches_to_symbols(matches: list) -> list:
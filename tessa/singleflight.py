@@ -0,0 +1,101 @@
+"""Single-flight request coalescing.
+
+When many threads ask for the same thing at once -- e.g., the price history of the same
+ticker on a cold cache -- only the first one (the "leader") should hit the network. The
+others wait for the leader to finish and get its result (or its error).
+
+Example use:
+
+```python
+FLIGHTS = SingleFlight()
+history = FLIGHTS.do(("AAPL", "yahoo"), retrieve_history, "AAPL")
+```
+
+`AsyncSingleFlight` does the same for coroutines within an event loop.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import threading
+
+
+class _Call:  # pylint: disable=too-few-public-methods
+    """A call in flight that followers can wait for."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Makes sure that there is at most one call in flight per key."""
+
+    coalesced: int
+    """Number of calls that didn't run themselves but waited for another call."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Call `func` with `args` and `kwargs` and return its result -- unless a call
+        with the same `key` is in flight already, in which case wait for that one and
+        return its result instead (or raise its error).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Makes sure that there is at most one coroutine in flight per key and event
+    loop.
+    """
+
+    coalesced: int
+    """Number of calls that didn't run themselves but waited for another call."""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(
+        self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs
+    ) -> Any:
+        """Run the coroutine function `func` with `args` and `kwargs` in a task and
+        return its result -- unless a task with the same `key` is in flight already, in
+        which case await that one instead. Cancelling a caller doesn't cancel the task
+        other callers wait for.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        task = self._tasks.get(flight_key)
+        if task is None:
+            task = self._tasks[flight_key] = loop.create_task(func(*args, **kwargs))
+            task.add_done_callback(lambda _: self._tasks.pop(flight_key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
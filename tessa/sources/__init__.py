@@ -5,7 +5,11 @@
 A `tessa.sources.sources.Source` ties together all the functionality and state related
 to a source such as Yahoo or Coingecko.
 
-`tessa.sources.rate_limiter.RateLimiter` takes care of rate limiting for a source.
+`tessa.sources.rate_limiter.RateLimiter` takes care of rate limiting for a source, and
+`tessa.sources.retry.RetryPolicy` decides how persistently failing calls are retried.
+A `tessa.sources.circuit_breaker.CircuitBreaker` stops calling a source that keeps
+failing, and `tessa.sources.http_session.HttpSession` holds the pooled HTTP session a
+source's requests share.
 
 All known sources are specified in `tessa.sources.sources_directory`.
 
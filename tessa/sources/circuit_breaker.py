@@ -0,0 +1,140 @@
+"""Circuit breaker -- stops calling a source that keeps failing.
+
+If a source is down or has blocked us, walking every request through the retry loop
+only piles up waiting requests. A `CircuitBreaker` on a source counts consecutive
+failures (rate limit hits, server-side errors, connection problems); after
+`failure_threshold` of them, it "opens" and calls fail fast with a
+`tessa.price.types.CircuitOpenError` (the price functions then serve stale data if they
+have any). After `reset_timeout` seconds, a single probe call is let through
+("half-open"): If it succeeds, the breaker closes again, otherwise it stays open for
+another `reset_timeout`.
+
+Monitor a breaker via `CircuitBreaker.info`:
+
+```python
+>>> get_source("coingecko").circuit_breaker.info()
+CircuitBreakerInfo(state='closed', consecutive_failures=0, count_opened=0, ...)
+```
+"""
+
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+import threading
+import time
+import requests
+from ..price.types import CircuitOpenError, RateLimitHitError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+CircuitBreakerInfo = NamedTuple(
+    "CircuitBreakerInfo",
+    [
+        ("state", str),
+        ("consecutive_failures", int),
+        ("count_opened", int),
+        ("count_rejected_calls", int),
+    ],
+)
+"""A circuit breaker's state and stats."""
+
+
+def is_source_failure(exc: BaseException) -> bool:
+    """Check if `exc` indicates a problem with the source itself (as opposed to, e.g.,
+    an unknown symbol).
+    """
+    if isinstance(exc, RateLimitHitError):
+        return True
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+@dataclass
+class CircuitBreaker:
+    """Encapsulates state and stats of a circuit breaker."""
+
+    failure_threshold: int = 5
+    """Open after this many consecutive failures."""
+
+    reset_timeout: float = 60.0
+    """Seconds to stay open before letting a probe call through."""
+
+    consecutive_failures: int = 0
+    """Number of failures since the last success."""
+
+    count_opened: int = 0
+    """Number of times the breaker opened."""
+
+    count_rejected_calls: int = 0
+    """Number of calls that failed fast."""
+
+    _opened_at: Optional[float] = field(default=None, init=False, repr=False)
+    _probing: bool = field(default=False, init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    @property
+    def state(self) -> str:
+        """`"closed"` (calls go through), `"open"` (calls fail fast), or `"half-open"`
+        (a probe call is or may be in flight).
+        """
+        if self._opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def before_call(self) -> None:
+        """Raise a `CircuitOpenError` if the call must not go through."""
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.count_rejected_calls += 1
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+            raise CircuitOpenError(self.consecutive_failures, retry_in)
+
+    def record_success(self) -> None:
+        """Close the breaker."""
+        with self._lock:
+            self.consecutive_failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failure and open the breaker if there were too many (or if the probe
+        failed).
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._probing or (
+                self._opened_at is None
+                and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.count_opened += 1
+
+    def reset(self) -> None:
+        """Reset state and stats."""
+        with self._lock:
+            self.consecutive_failures = self.count_opened = 0
+            self.count_rejected_calls = 0
+            self._opened_at = None
+            self._probing = False
+
+    def info(self) -> CircuitBreakerInfo:
+        """Return the current state and stats."""
+        with self._lock:
+            return CircuitBreakerInfo(
+                self.state,
+                self.consecutive_failures,
+                self.count_opened,
+                self.count_rejected_calls,
+            )
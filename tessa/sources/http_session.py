@@ -0,0 +1,120 @@
+"""HTTP sessions -- each `tessa.sources.sources.Source` keeps one long-lived, pooled
+session that all of its price and search callbacks share, so connections (and their TLS
+handshakes) get reused across requests instead of being set up anew for every request.
+
+Configure a source's session in `tessa.sources.sources_directory.SOURCES_DIRECTORY` or
+replace it at runtime:
+
+```python
+from tessa.sources import get_source
+from tessa.sources.http_session import HttpSession
+get_source("coingecko").http_session = HttpSession(pool_size=20, timeout=10)
+```
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """`HTTPAdapter` that applies a default timeout to requests that don't set one."""
+
+    def __init__(self, timeout: float, **kwargs) -> None:
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):  # pylint: disable=arguments-differ
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def requests_session(config: HttpSession) -> requests.Session:
+    """Create a `requests.Session` according to `config`."""
+    session = requests.Session()
+    adapter = _TimeoutAdapter(
+        config.timeout, pool_connections=config.pool_size, pool_maxsize=config.pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not config.keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def curl_cffi_session(config: HttpSession) -> Any:
+    """Create a browser-impersonating `curl_cffi` session according to `config`. This
+    is the kind of session yfinance needs to get through to Yahoo Finance.
+    """
+    # pylint: disable=import-outside-toplevel
+    from curl_cffi import CurlOpt, requests as curl_requests
+
+    return curl_requests.Session(
+        impersonate="chrome",
+        timeout=config.timeout,
+        curl_options={
+            CurlOpt.MAXCONNECTS: config.pool_size,
+            CurlOpt.FORBID_REUSE: 0 if config.keep_alive else 1,
+        },
+    )
+
+
+def yfinance_session(config: HttpSession) -> Any:
+    """Create a `curl_cffi_session` according to `config` and make yfinance use it.
+    (yfinance shares one process-wide session between all tickers, so it is set once
+    here rather than with every ticker.)
+    """
+    # pylint: disable=import-outside-toplevel
+    from yfinance.data import YfData
+
+    session = curl_cffi_session(config)
+    YfData(session=session)
+    return session
+
+
+@dataclass
+class HttpSession:
+    """Encapsulates the configuration of a source's HTTP session and the session
+    itself, which gets created on first use.
+    """
+
+    pool_size: int = 10
+    """Maximum number of connections to keep open, i.e., the number of concurrent
+    requests that can reuse connections.
+    """
+
+    timeout: float = 30.0
+    """Seconds to wait for the server before giving up on a request."""
+
+    keep_alive: bool = True
+    """Keep connections open for later requests. Set to `False` to close each
+    connection after its request.
+    """
+
+    factory: Callable[[HttpSession], Any] = requests_session
+    """Creates the session from this configuration, see `requests_session`,
+    `curl_cffi_session`, and `yfinance_session`.
+    """
+
+    _session: Optional[Any] = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    def get(self) -> Any:
+        """Return the session, creating it on first use."""
+        with self._lock:
+            if self._session is None:
+                self._session = self.factory(self)
+            return self._session
+
+    def close(self) -> None:
+        """Close the session and its connections. The next `get` creates a new one."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -4,16 +4,56 @@ amount of time has elapsed between calls to an API.
 The goal is to never run into errors in the first place, b/c some sites take substantial
 time until it allow-lists a blocked IP address again. That is also why we can't use a
 library such das Tenacity here.
+
+Besides the simple `RateLimiter`, which enforces a fixed gap between calls, there is a
+`TokenBucketRateLimiter`, which can express quotas such as "30 calls per minute with
+bursts of 5". Configure a source's limiter in
+`tessa.sources.sources_directory.SOURCES_DIRECTORY` or replace it at runtime:
+
+```python
+from tessa.sources import get_source
+from tessa.sources.rate_limiter import TokenBucketRateLimiter
+get_source("coingecko").rate_limiter = TokenBucketRateLimiter(
+    rate=30, burst=5, window=60
+)
+```
+
+If several processes on the same host use tessa (e.g., web server workers plus cron
+jobs), give them a `SharedRateLimiter` instead, so they respect the quota together:
+
+```python
+get_source("coingecko").rate_limiter = SharedRateLimiter(
+    name="coingecko", rate=30, burst=5, window=60
+)
+```
+
+If you don't know a provider's allowance, an `AdaptiveRateLimiter` will find it: It
+speeds up while calls succeed and slows down sharply on rate limit hits or rising
+latency.
 """
 
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import IO, Iterator, Optional
+import asyncio
 import datetime
+import json
+import os
+import tempfile
+import threading
 import time
 import pendulum
 
+try:
+    import fcntl
+except ImportError:  # (Windows)
+    fcntl = None
+    import msvcrt
+
 
 VERY_LONG_AGO = pendulum.parse("1900")
 INITIAL_BACK_OFF_TIME = 10
+DEFAULT_SHARED_DIRECTORY = os.path.join(tempfile.gettempdir(), "tessa-rate-limits")
 
 
 @dataclass
@@ -35,26 +75,276 @@ class RateLimiter:
     back_off_time: int = INITIAL_BACK_OFF_TIME
     """Number of seconds to wait after a rate limit hit."""
 
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
     def reset_back_off(self):
         """Reset back-off time to initial value."""
         self.back_off_time = INITIAL_BACK_OFF_TIME
 
+    def record_success(self, latency: float) -> None:
+        """Hook called after a successful call that took `latency` seconds. Does nothing
+        here; see `AdaptiveRateLimiter`.
+        """
+
+    def record_rate_limit_hit(self) -> None:
+        """Hook called after a call hit the rate limit. Does nothing here; see
+        `AdaptiveRateLimiter`.
+        """
+
     def reset(self):
         """Reset state and stats."""
         self.last_call = VERY_LONG_AGO
         self.count_all_calls = self.count_limited_calls = 0
         self.reset_back_off()
 
+    def _book_call(self) -> float:
+        """Book the next call and return the number of seconds to wait for it. Books
+        the slot before any waiting happens, so concurrent callers line up one after the
+        other.
+        """
+        with self._lock:
+            now = pendulum.now()
+            wait = max(0.0, self.wait_seconds - (now - self.last_call).total_seconds())
+            if wait > 0:
+                self.count_limited_calls += 1
+            self.last_call = now + datetime.timedelta(seconds=wait)
+            self.count_all_calls += 1
+            return wait
+
     def rate_limit(self):
         """Enforce the minimum wait time as specified in `wait_seconds`."""
-        diff = (pendulum.now() - self.last_call).total_seconds()
-        if diff < self.wait_seconds:
-            time.sleep(self.wait_seconds - diff)
+        wait = self._book_call()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def rate_limit_async(self):
+        """Same as `rate_limit` but awaits instead of blocking."""
+        wait = self._book_call()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def back_off(self, seconds: Optional[float] = None):
+        """Back off exponentially: Wait `back_off_time` (or `seconds` if given, e.g., a
+        capped or jittered value) and double `back_off_time`.
+        """
+        time.sleep(self.back_off_time if seconds is None else seconds)
+        self.back_off_time *= 2
+
+    async def back_off_async(self, seconds: Optional[float] = None):
+        """Same as `back_off` but awaits instead of blocking."""
+        await asyncio.sleep(self.back_off_time if seconds is None else seconds)
+        self.back_off_time *= 2
+
+
+@dataclass(kw_only=True)
+class TokenBucketRateLimiter(RateLimiter):
+    """A rate limiter that allows `rate` calls per `window` seconds on average and
+    bursts of up to `burst` calls in a row. Uses a monotonic clock.
+
+    Think of a bucket holding up to `burst` tokens, which is refilled at `rate` tokens
+    per `window`. Every call takes a token; if there is none, the call waits until the
+    next token arrives.
+    """
+
+    wait_seconds: float = 0.0
+    """Not used by this rate limiter."""
+
+    rate: float
+    """Number of calls allowed per `window` on average."""
+
+    burst: int = 1
+    """Maximum number of calls in a row without waiting."""
+
+    window: float = 1.0
+    """Length of the window (in seconds) `rate` refers to."""
+
+    _tokens: float = field(init=False, repr=False, compare=False)
+    _refilled_at: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.rate <= 0 or self.burst < 1 or self.window <= 0:
+            raise ValueError("rate and window must be positive and burst at least 1.")
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+
+    def reset(self):
+        """Reset state and stats, including a full bucket."""
+        super().reset()
+        with self._lock:
+            self._tokens = float(self.burst)
+            self._refilled_at = time.monotonic()
+
+    def _book_call(self) -> float:
+        """Take a token and return the number of seconds to wait for it. Tokens can be
+        taken in advance (i.e., the bucket can go negative), so concurrent callers line
+        up one after the other.
+        """
+        with self._lock:
+            return self._take_token(time.monotonic())
+
+    def _take_token(self, now: float) -> float:
+        """Refill the bucket up to `now`, take a token, and return the number of seconds
+        to wait for it.
+        """
+        per_second = self.rate / self.window
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._refilled_at) * per_second
+        )
+        self._refilled_at = now
+        self._tokens -= 1
+        wait = max(0.0, -self._tokens / per_second)
+        if wait > 0:
             self.count_limited_calls += 1
-        self.last_call = pendulum.now()
         self.count_all_calls += 1
+        return wait
 
-    def back_off(self):
-        """Back off exponentially."""
-        time.sleep(self.back_off_time)
-        self.back_off_time *= 2
+
+@contextmanager
+def _locked_file(path: str) -> Iterator[IO[str]]:
+    """Open `path` (creating it if needed) and hold an exclusive lock on it, which is
+    respected by all processes on the host.
+    """
+    with open(path, "a+", encoding="utf-8") as file:
+        file.seek(0)
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield file
+        finally:
+            file.flush()
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@dataclass(kw_only=True)
+class SharedRateLimiter(TokenBucketRateLimiter):
+    """A `TokenBucketRateLimiter` whose bucket is shared by all processes on the host,
+    e.g., several web server workers plus cron jobs. The bucket lives in a small state
+    file named after the source, which is locked while a call is booked. Since the
+    processes have to agree on the time, this uses the wall clock.
+
+    Use `burst=1` and `rate=1, window=wait_seconds` to get the behavior of a plain
+    `RateLimiter`. The stats (`count_all_calls`, etc.) are per process.
+    """
+
+    name: str
+    """Name of the bucket, usually the source's name. Limiters with the same name (and
+    `directory`) share their bucket.
+    """
+
+    directory: str = DEFAULT_SHARED_DIRECTORY
+    """Directory to keep the state files in."""
+
+    @property
+    def path(self) -> str:
+        """Path to the state file."""
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    def _book_call(self) -> float:
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _locked_file(self.path) as file:
+            content = file.read()
+            now = time.time()
+            if content:
+                state = json.loads(content)
+                self._tokens, self._refilled_at = state["tokens"], state["refilled_at"]
+            else:
+                self._tokens, self._refilled_at = float(self.burst), now
+            wait = self._take_token(now)
+            file.seek(0)
+            file.truncate()
+            json.dump({"tokens": self._tokens, "refilled_at": self._refilled_at}, file)
+            return wait
+
+    def reset(self):
+        """Reset state and stats, including a full bucket -- for all processes."""
+        super().reset()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, _locked_file(self.path) as file:
+            file.seek(0)
+            file.truncate()
+
+
+@dataclass(kw_only=True)
+class AdaptiveRateLimiter(RateLimiter):
+    """A `RateLimiter` that adjusts `wait_seconds` to the provider's actual limits
+    (additive increase, multiplicative decrease -- "AIMD"): Every successful call
+    raises the call rate a little, every rate limit hit or markedly slower call cuts it
+    sharply.
+
+    `wait_seconds` is where the limiter starts (unless there is a learned value in
+    `state_path`) and gets adjusted from there within `min_wait_seconds` and
+    `max_wait_seconds`.
+    """
+
+    min_wait_seconds: float = 0.1
+    """Never wait less than this between calls."""
+
+    max_wait_seconds: float = 60.0
+    """Never wait more than this between calls."""
+
+    increase: float = 0.01
+    """Calls per second to add to the rate after every successful call."""
+
+    decrease_factor: float = 0.5
+    """Factor to multiply the rate with after a rate limit hit or a slow call."""
+
+    latency_factor: float = 2.0
+    """A call counts as slow if it takes this many times longer than the calls before
+    (on average).
+    """
+
+    state_path: Optional[str] = None
+    """File to persist the learned `wait_seconds` in, so it survives process restarts.
+    `None` to not persist anything.
+    """
+
+    _latency: Optional[float] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.state_path is not None and os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as file:
+                self.wait_seconds = json.load(file)["wait_seconds"]
+        self.wait_seconds = self._clamp(self.wait_seconds)
+
+    def _clamp(self, wait_seconds: float) -> float:
+        return min(self.max_wait_seconds, max(self.min_wait_seconds, wait_seconds))
+
+    def _adjust(self, rate: float) -> None:
+        """Set the rate (calls per second) and persist the resulting `wait_seconds`."""
+        self.wait_seconds = self._clamp(1 / rate)
+        if self.state_path is not None:
+            with open(self.state_path, "w", encoding="utf-8") as file:
+                json.dump({"wait_seconds": self.wait_seconds}, file)
+
+    def record_success(self, latency: float) -> None:
+        """Speed up a little -- unless the call was slow, which is often a sign of a
+        struggling provider, in which case slow down sharply.
+        """
+        with self._lock:
+            rate = 1 / self.wait_seconds
+            if (
+                self._latency is not None
+                and latency > self.latency_factor * self._latency
+            ):
+                rate *= self.decrease_factor
+            else:
+                rate += self.increase
+            self._latency = (
+                latency
+                if self._latency is None
+                else 0.8 * self._latency + 0.2 * latency
+            )
+            self._adjust(rate)
+
+    def record_rate_limit_hit(self) -> None:
+        """Slow down sharply."""
+        with self._lock:
+            self._adjust(self.decrease_factor / self.wait_seconds)
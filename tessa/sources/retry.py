@@ -0,0 +1,74 @@
+"""Retry policies -- how persistently a `tessa.sources.sources.Source` retries calls
+that fail with a rate limit hit or an intermittent server-side error.
+
+The default policy retries up to 100 times and doubles the back-off after every rate
+limit hit, which can block for a very long time. To bound that, e.g., in a web
+application with latency requirements, set a different policy on a source or pass a
+deadline per call:
+
+```python
+from tessa.sources import get_source
+from tessa.sources.retry import RetryPolicy
+get_source("coingecko").retry_policy = RetryPolicy(
+    deadline=60, max_back_off=20, jitter=True
+)
+
+price_history("bitcoin", "coingecko", deadline=30)
+```
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import random
+import time
+
+MAX_TRIES = 100
+"""Give up after this many retries by default."""
+
+
+@dataclass
+class RetryPolicy:
+    """Encapsulates how often and how long to retry failing calls."""
+
+    max_tries: int = MAX_TRIES
+    """Give up after this many retries."""
+
+    deadline: Optional[float] = None
+    """Give up (raising a `tessa.price.types.RetryDeadlineExceededError`) once retrying
+    would take longer than this many seconds in total. `None` for no deadline. Note that
+    a call in progress can't be interrupted, so a single slow call can still exceed the
+    deadline.
+    """
+
+    max_back_off: Optional[float] = None
+    """Never back off longer than this many seconds after a rate limit hit. `None` for
+    no cap.
+    """
+
+    jitter: bool = False
+    """Back off a random time between 0 and the back-off time ("full jitter"), so
+    callers that hit the rate limit together don't retry together.
+    """
+
+    retryable_statuses: Tuple[int, ...] = (502, 503, 504)
+    """HTTP status codes that are considered intermittent and therefore retried."""
+
+    def back_off_seconds(self, back_off_time: float) -> float:
+        """Return how long to back off given the rate limiter's current
+        `back_off_time`.
+        """
+        seconds = back_off_time
+        if self.max_back_off is not None:
+            seconds = min(seconds, self.max_back_off)
+        if self.jitter:
+            seconds = random.uniform(0, seconds)
+        return seconds
+
+    def exceeds_deadline(self, started_at: float, seconds: float = 0) -> bool:
+        """Check if waiting another `seconds` after having started at `started_at`
+        (monotonic time) would exceed the deadline.
+        """
+        return (
+            self.deadline is not None
+            and time.monotonic() - started_at + seconds > self.deadline
+        )
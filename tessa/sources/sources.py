@@ -1,13 +1,28 @@
 """Source class and related functions."""
 
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Callable, Generator, TYPE_CHECKING
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    TYPE_CHECKING,
+)
+import asyncio
+import time
 import warnings
+import pandas as pd
 import requests
 from .sourcetype import SourceType
 from .rate_limiter import RateLimiter
-from ..price.types import RateLimitHitError
+from .circuit_breaker import CircuitBreaker, is_source_failure
+from .http_session import HttpSession
+from .retry import RetryPolicy
+from ..price.types import RateLimitHitError, RetryDeadlineExceededError
 
 if TYPE_CHECKING:
     from ..price import PriceHistory
@@ -20,7 +35,9 @@ class Source:
     """
 
     get_price_history: Callable
-    """Callback to retrieve price history."""
+    """Callback to retrieve price history. Takes a query, a currency preference, and
+    optional `start` and `end` dates (`end` being exclusive).
+    """
 
     get_search_results: Callable
     """Callback to retrieve search results."""
@@ -28,44 +45,224 @@ class Source:
     rate_limiter: RateLimiter
     """Rate limiter object."""
 
+    get_price_histories: Optional[Callable] = None
+    """Optional callback to retrieve several price histories in one batch. Takes a list
+    of queries and a currency preference and returns a dictionary mapping each
+    successfully retrieved query to its `PriceHistory` and each query that failed
+    permanently to the error. Rate limits each request it sends itself.
+    """
+
+    get_latest_price: Optional[Callable] = None
+    """Optional callback to retrieve only the latest price, which is much cheaper than
+    retrieving the full history. Takes a query and a currency preference and returns a
+    `PriceHistory` with a single row.
+    """
+
+    get_latest_prices: Optional[Callable] = None
+    """Optional callback to retrieve the latest prices of several queries in several
+    currencies in one batch. Takes a list of queries and a list of currency preferences
+    and returns a dictionary mapping each (query, currency preference) pair that was
+    found to a `PriceHistory` with a single row.
+    """
+
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    """How persistently to retry failing calls, see `tessa.sources.retry`."""
+
+    circuit_breaker: Optional[CircuitBreaker] = None
+    """Optional circuit breaker to fail fast while the source keeps failing, see
+    `tessa.sources.circuit_breaker`.
+    """
+
+    normalize_query: Callable[[str], str] = str.strip
+    """Turns a query into its canonical form, so equivalent queries share one cache
+    entry (see `tessa.price.retrieval.cache_key`).
+    """
+
+    http_session: HttpSession = field(default_factory=HttpSession)
+    """The HTTP session the callbacks share, see `tessa.sources.http_session`."""
+
     def get_price_history_bruteforcefully(
-        self, query: str, currency_preference: str = "USD"
+        self,
+        query: str,
+        currency_preference: str = "USD",
+        start: Optional[Union[str, pd.Timestamp]] = None,
+        end: Optional[Union[str, pd.Timestamp]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ) -> PriceHistory:
         """Variant of `get_price_history` that will ignore some server-side errors
         (which often seem to be intermittent, at least on Coingecko) and just
-        retries.
+        retries. Use `start` and `end` to only retrieve the history within that range.
+        `retry_policy` overrides the source's `retry_policy` for this call.
         """
-        max_tries = 100
+        return self._call_bruteforcefully(
+            retry_policy,
+            self.get_price_history,
+            query,
+            currency_preference,
+            start=start,
+            end=end,
+        )
+
+    async def get_price_history_bruteforcefully_async(
+        self,
+        query: str,
+        currency_preference: str = "USD",
+        start: Optional[Union[str, pd.Timestamp]] = None,
+        end: Optional[Union[str, pd.Timestamp]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> PriceHistory:
+        """Same as `get_price_history_bruteforcefully` but runs the (blocking) callback
+        in a worker thread and awaits back-offs instead of blocking.
+        """
+        return await self._call_bruteforcefully_async(
+            retry_policy,
+            self.get_price_history,
+            query,
+            currency_preference,
+            start=start,
+            end=end,
+        )
+
+    def get_latest_price_bruteforcefully(
+        self,
+        query: str,
+        currency_preference: str = "USD",
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> PriceHistory:
+        """Same as `get_price_history_bruteforcefully` but for `get_latest_price`."""
+        return self._call_bruteforcefully(
+            retry_policy, self.get_latest_price, query, currency_preference
+        )
+
+    def get_latest_prices_bruteforcefully(
+        self,
+        queries: List[str],
+        currency_preferences: List[str],
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> Dict[Tuple[str, str], PriceHistory]:
+        """Same as `get_price_history_bruteforcefully` but for `get_latest_prices`."""
+        return self._call_bruteforcefully(
+            retry_policy, self.get_latest_prices, queries, currency_preferences
+        )
+
+    async def get_latest_price_bruteforcefully_async(
+        self,
+        query: str,
+        currency_preference: str = "USD",
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> PriceHistory:
+        """Same as `get_price_history_bruteforcefully_async` but for
+        `get_latest_price`.
+        """
+        return await self._call_bruteforcefully_async(
+            retry_policy, self.get_latest_price, query, currency_preference
+        )
+
+    def _call_bruteforcefully(
+        self, retry_policy: Optional[RetryPolicy], func: Callable, *args, **kwargs
+    ):
+        """Call `func` and retry on server-side errors according to `retry_policy`
+        (or the source's policy if `None`), see `_needs_back_off`.
+        """
+        policy = retry_policy or self.retry_policy
+        started_at = time.monotonic()
         tries = 0
         while True:
             tries += 1
+            call_started_at = time.monotonic()
             try:
-                res = self.get_price_history(query, currency_preference)
+                res = self._call_guarded(func, *args, **kwargs)
                 self.rate_limiter.reset_back_off()
+                self.rate_limiter.record_success(time.monotonic() - call_started_at)
                 return res
-            except requests.HTTPError as exc:
-                if exc.response.status_code not in [504, 503, 502]:
-                    raise exc
-                if tries > max_tries:
-                    raise ConnectionError(
-                        f"Cannot access source, even after {max_tries} tries. "
-                        "(Reraising from latest exception, there might have been "
-                        "several.)"
-                    ) from exc
-                warnings.warn(
-                    f"Latest request raised for status code {exc.response.status_code}."
-                    f" Retrying ({tries}/{max_tries}).",
-                    RuntimeWarning,
-                )
-            except RateLimitHitError:
-                if tries > max_tries:
-                    raise
-                warnings.warn(
-                    "Rate limit hit (429). "
-                    f"Backing off {self.rate_limiter.back_off_time} seconds. "
-                    f"({tries}/{max_tries})"
-                )
-                self.rate_limiter.back_off()
+            except (requests.HTTPError, RateLimitHitError) as exc:
+                if isinstance(exc, RateLimitHitError):
+                    self.rate_limiter.record_rate_limit_hit()
+                back_off_seconds = self._needs_back_off(exc, tries, policy, started_at)
+                if back_off_seconds is not None:
+                    self.rate_limiter.back_off(back_off_seconds)
+
+    async def _call_bruteforcefully_async(
+        self, retry_policy: Optional[RetryPolicy], func: Callable, *args, **kwargs
+    ):
+        """Same as `_call_bruteforcefully` but runs `func` in a worker thread and
+        awaits back-offs.
+        """
+        policy = retry_policy or self.retry_policy
+        started_at = time.monotonic()
+        tries = 0
+        while True:
+            tries += 1
+            call_started_at = time.monotonic()
+            try:
+                res = await asyncio.to_thread(self._call_guarded, func, *args, **kwargs)
+                self.rate_limiter.reset_back_off()
+                self.rate_limiter.record_success(time.monotonic() - call_started_at)
+                return res
+            except (requests.HTTPError, RateLimitHitError) as exc:
+                if isinstance(exc, RateLimitHitError):
+                    self.rate_limiter.record_rate_limit_hit()
+                back_off_seconds = self._needs_back_off(exc, tries, policy, started_at)
+                if back_off_seconds is not None:
+                    await self.rate_limiter.back_off_async(back_off_seconds)
+
+    def _call_guarded(self, func: Callable, *args, **kwargs):
+        """Call `func` through the circuit breaker (if any)."""
+        if self.circuit_breaker is None:
+            return func(*args, **kwargs)
+        self.circuit_breaker.before_call()
+        try:
+            res = func(*args, **kwargs)
+        except Exception as exc:
+            if is_source_failure(exc):
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            raise
+        self.circuit_breaker.record_success()
+        return res
+
+    def _needs_back_off(
+        self,
+        exc: Union[requests.HTTPError, RateLimitHitError],
+        tries: int,
+        policy: RetryPolicy,
+        started_at: float,
+    ) -> Optional[float]:
+        """Decide how to go on after `exc` was raised in the `tries`th attempt: Reraise
+        if the error is not retryable or there have been too many tries already, raise
+        a `RetryDeadlineExceededError` if the policy's deadline would be exceeded.
+        Otherwise, return the number of seconds to back off before retrying or `None` to
+        retry right away.
+        """
+        if isinstance(exc, RateLimitHitError):
+            if tries > policy.max_tries:
+                raise exc
+            seconds = policy.back_off_seconds(self.rate_limiter.back_off_time)
+            if policy.exceeds_deadline(started_at, seconds):
+                raise RetryDeadlineExceededError(policy.deadline) from exc
+            warnings.warn(
+                "Rate limit hit (429). "
+                f"Backing off {seconds:g} seconds. "
+                f"({tries}/{policy.max_tries})"
+            )
+            return seconds
+        if exc.response.status_code not in policy.retryable_statuses:
+            raise exc
+        if tries > policy.max_tries:
+            raise ConnectionError(
+                f"Cannot access source, even after {policy.max_tries} tries. "
+                "(Reraising from latest exception, there might have been "
+                "several.)"
+            ) from exc
+        if policy.exceeds_deadline(started_at):
+            raise RetryDeadlineExceededError(policy.deadline) from exc
+        warnings.warn(
+            f"Latest request raised for status code {exc.response.status_code}."
+            f" Retrying ({tries}/{policy.max_tries}).",
+            RuntimeWarning,
+        )
+        return None
 
 
 def get_source(name: SourceType) -> Source:
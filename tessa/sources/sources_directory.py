@@ -6,7 +6,9 @@ be imported late within functions in order to prevent circular dependencies.
 from typing import Dict, Final
 from .sources import Source
 from .sourcetype import SourceType
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, TokenBucketRateLimiter
+from .circuit_breaker import CircuitBreaker
+from .http_session import HttpSession, yfinance_session
 from ..price import yahoo as yahooprice, coingecko as coingeckoprice
 from ..search import yahoo as yahoosearch, coingecko as coingeckosearch
 
@@ -15,10 +17,23 @@ SOURCES_DIRECTORY: Final[Dict[SourceType, Source]] = {
         get_price_history=yahooprice.get_price_history,
         get_search_results=yahoosearch.yahoo_search,
         rate_limiter=RateLimiter(0.5),
+        get_price_histories=yahooprice.get_price_histories,
+        get_latest_price=yahooprice.get_latest_price,
+        circuit_breaker=CircuitBreaker(),
+        normalize_query=yahooprice.normalize_query,
+        # At least as many connections as `get_price_histories` runs requests at once:
+        http_session=HttpSession(
+            pool_size=yahooprice.MAX_CONCURRENT_REQUESTS, factory=yfinance_session
+        ),
     ),
     "coingecko": Source(
         get_price_history=coingeckoprice.get_price_history,
         get_search_results=coingeckosearch.coingecko_search,
-        rate_limiter=RateLimiter(2.5),
+        # Same average as a 2.5 seconds gap, but allows for short bursts:
+        rate_limiter=TokenBucketRateLimiter(rate=24, burst=3, window=60),
+        get_latest_price=coingeckoprice.get_latest_price,
+        get_latest_prices=coingeckoprice.get_latest_prices,
+        circuit_breaker=CircuitBreaker(),
+        normalize_query=coingeckoprice.normalize_query,
     ),
 }
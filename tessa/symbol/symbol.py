@@ -1,12 +1,19 @@
 """Symbol class."""
 
-from typing import Union, Optional, ClassVar
+from typing import Iterable, Union, Optional, ClassVar
 from dataclasses import dataclass, field
 import datetime
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from ..price import price_history, price_latest, price_point, PricePoint, PriceHistory
+from ..price import (
+    price_history,
+    price_latest,
+    price_point,
+    price_points,
+    PricePoint,
+    PriceHistory,
+)
 from .. import SourceType
 
 pd.plotting.register_matplotlib_converters()
@@ -19,7 +26,9 @@ class Symbol:
 
     Notes:
     - Price-related functions rely on caching happening on lower levels to be efficient;
-      this is fulfilled thanks to the way tessa's caching works.
+      this is fulfilled thanks to the way tessa's caching works. Use
+      `tessa.symbol.symbolcollection.SymbolCollection.prefetch` to fill the cache for
+      many symbols ahead of time.
     - The initializers don't hit the network -- it will only be hit when accessing the
       price methods or related methods such as `currency`.
     """
@@ -96,9 +105,15 @@ class Symbol:
         """Return the latest close price."""
         return price_latest(**self._create_price_args())
 
-    def price_history(self) -> PriceHistory:
-        """Return a tuple of the full price history."""
-        return price_history(**self._create_price_args())
+    def price_history(
+        self,
+        start: Optional[Union[str, pd.Timestamp]] = None,
+        end: Optional[Union[str, pd.Timestamp]] = None,
+    ) -> PriceHistory:
+        """Return a tuple of the price history, the full one unless `start` and/or
+        `end` are given.
+        """
+        return price_history(**self._create_price_args(), start=start, end=end)
 
     def price_point(self, when: Union[str, pd.Timestamp]) -> PricePoint:
         """Look up price at given date `when`. Look for the closest point in time if the
@@ -110,6 +125,16 @@ class Symbol:
             max_date_deviation_days=self.max_date_deviation_days,
         )
 
+    def price_points(self, whens: Iterable[Union[str, pd.Timestamp]]) -> pd.DataFrame:
+        """Look up prices at all the dates in `whens` at once. See
+        `tessa.price.price.price_points`.
+        """
+        return price_points(
+            **self._create_price_args(),
+            whens=whens,
+            max_date_deviation_days=self.max_date_deviation_days,
+        )
+
     def price_graph(self, monthsback: int = 6) -> tuple:
         """Display this symbol's price graph over the last monthsback months.
 
@@ -1,10 +1,14 @@
 """SymbolCollection class."""
 
 from __future__ import annotations
-from typing import Optional, Type, Union, List
+from typing import Callable, Dict, Iterable, Optional, Type, Union, List
 import collections
+import threading
+import pandas as pd
 import yaml
 from . import Symbol
+from ..price import price_panel, PricePanel, fetch_price_histories, PriceRequest
+from .. import SourceType
 
 
 class SymbolCollection:
@@ -59,6 +63,64 @@ class SymbolCollection:
         """Find all `Symbol`s that match the query."""
         return [s for s in self.symbols if s.matches(what)]
 
+    def price_panel(
+        self,
+        dates: Iterable[Union[str, pd.Timestamp]],
+        tolerance: Optional[Union[str, pd.Timedelta]] = pd.Timedelta(days=10),
+    ) -> PricePanel:
+        """Return the prices of all symbols at `dates` as a `PricePanel`, with one
+        column per symbol. See `tessa.price.panel.price_panel`.
+        """
+        return price_panel(self, dates, tolerance=tolerance)
+
+    def prefetch(
+        self,
+        workers: int = 1,
+        sources: Optional[Iterable[SourceType]] = None,
+        on_progress: Optional[
+            Callable[[Symbol, Optional[Exception], int, int], None]
+        ] = None,
+    ) -> Dict[str, Exception]:
+        """Warm the price cache for all symbols (or only those from `sources`), so later
+        price lookups don't hit the network. Retrieves the histories concurrently, see
+        `tessa.price.fetch.fetch_price_histories`, with up to `workers` requests per
+        source in flight at once (still within each source's rate limits).
+
+        `on_progress` is called after each symbol with the symbol, the error (or
+        `None`), the number of symbols done, and the total number of symbols. A failing
+        symbol doesn't abort the run; returns a dictionary mapping the names of the
+        failed symbols to their errors.
+        """
+        if sources is not None:
+            sources = set(sources)
+        symbols = [s for s in self.symbols if sources is None or s.source in sources]
+        by_request: Dict[PriceRequest, List[Symbol]] = collections.defaultdict(list)
+        for symbol in symbols:
+            request = PriceRequest(
+                symbol.query, symbol.source, symbol.currency_preference
+            )
+            by_request[request].append(symbol)
+
+        done = 0
+        lock = threading.Lock()
+
+        def report_progress(request: PriceRequest, error: Optional[Exception]) -> None:
+            nonlocal done
+            for symbol in by_request[request]:
+                with lock:
+                    done += 1
+                    if on_progress is not None:
+                        on_progress(symbol, error, done, len(symbols))
+
+        report = fetch_price_histories(
+            by_request, report_progress, copy=False, workers_per_source=workers
+        )
+        return {
+            symbol.name: error
+            for request, error in report.errors.items()
+            for symbol in by_request[request]
+        }
+
     def load_yaml(self, yaml_file: str, which_class: Type[Symbol] = Symbol) -> None:
         """Load symbols from a YAML file.
 
@@ -0,0 +1,82 @@
+"""Test the asynchronous price functions."""
+
+# pylint: disable=missing-docstring
+
+import asyncio
+import time
+import pandas as pd
+from tessa import aio, price_history, sources
+from tessa.price import PriceHistory, PricePoint
+from tessa.price.types import RateLimitHitError
+
+
+def test_aio_shares_cache_with_sync_api(mocker):
+    df = pd.DataFrame(
+        {"close": [1.0, 2.0]},
+        index=pd.to_datetime(["2020-01-01", "2020-01-02"], utc=True),
+    )
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src, "get_price_history", return_value=PriceHistory(df, "usd")
+    )
+    sources.reset_rate_limiters()
+    price_history.cache_clear()
+    try:
+        res = asyncio.run(aio.price_point("AAPL", "2020-01-01"))
+        assert res.price == 1.0
+        res = asyncio.run(aio.price_latest("AAPL"))
+        assert res == PricePoint(pd.Timestamp("2020-01-02", tz="UTC"), 2.0, "USD")
+        assert price_history("AAPL").currency == "USD"
+        assert mocked.call_count == 1
+        assert src.rate_limiter.count_all_calls == 1
+    finally:
+        price_history.cache_clear()
+
+
+def test_aio_backs_off_without_blocking(mocker):
+    is_first_call = True
+
+    def get_price_history(*_, **__):
+        nonlocal is_first_call
+        if is_first_call:
+            is_first_call = False
+            raise RateLimitHitError(source="yahoo")
+        return PriceHistory(pd.DataFrame({"close": [1.0]}), "USD")
+
+    src = sources.get_source("yahoo")
+    mocker.patch.object(src, "get_price_history", new=get_price_history)
+    mocker.patch("warnings.warn")
+    sleep = mocker.patch("asyncio.sleep", new=mocker.AsyncMock())
+    blocking_sleep = mocker.patch("time.sleep")
+    price_history.cache_clear()
+    try:
+        asyncio.run(aio.price_history("AAPL"))
+    finally:
+        price_history.cache_clear()
+        sources.reset_rate_limiters()
+    sleep.assert_any_await(10)
+    blocking_sleep.assert_not_called()
+
+
+def test_aio_coalesces_concurrent_retrievals(mocker):
+    def get_price_history(*_, **__):
+        time.sleep(0.05)
+        return PriceHistory(pd.DataFrame({"close": [1.0]}), "USD")
+
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src, "get_price_history", side_effect=get_price_history
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit_async", new=mocker.AsyncMock())
+
+    async def main() -> list:
+        return await asyncio.gather(*(aio.price_history("AAPL") for _ in range(20)))
+
+    price_history.cache_clear()
+    try:
+        results = asyncio.run(main())
+    finally:
+        price_history.cache_clear()
+    assert [r.df["close"].iloc[0] for r in results] == [1.0] * 20
+    assert mocked.call_count == 1
+    assert aio.IN_FLIGHT.coalesced >= 19
@@ -0,0 +1,138 @@
+"""Test the in-memory price cache."""
+
+# pylint: disable=missing-docstring
+
+import pandas as pd
+from tessa.price import PriceHistory
+from tessa.price.cache import (
+    NegativeCache,
+    PriceCache,
+    history_nbytes,
+    missing_segments,
+    union,
+)
+from tessa.price.types import RateLimitHitError, SymbolNotFoundError
+
+
+def make_history(rows: int) -> PriceHistory:
+    index = pd.date_range("2020-01-01", periods=rows, tz="UTC", name="date")
+    return PriceHistory(pd.DataFrame({"close": range(rows)}, index=index), "USD")
+
+
+def test_stats():
+    cache = PriceCache()
+    assert cache.get("a") is None
+    cache.put("a", make_history(3))
+    assert cache.get("a").currency == "USD"
+    info = cache.info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 1, 0, 1)
+    assert info.nbytes == history_nbytes(make_history(3))
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 0, 0, None)
+
+
+def test_evicts_least_recently_used_beyond_byte_budget():
+    entry_size = history_nbytes(make_history(100))
+    cache = PriceCache(max_bytes=int(entry_size * 2.5))
+    for key in "abc":
+        cache.put(key, make_history(100))
+        cache.get("a")  # Keep "a" fresh
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.info().evictions == 1
+    assert cache.info().nbytes == 2 * entry_size
+
+
+def test_keeps_single_entry_exceeding_budget():
+    cache = PriceCache(max_bytes=1)
+    cache.put("a", make_history(100))
+    cache.put("b", make_history(100))
+    assert "a" not in cache
+    assert "b" in cache
+
+
+def test_expires_entries(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    cache = PriceCache(ttl_seconds=60)
+    cache.put("a", make_history(1))
+    monotonic.return_value = 1059.0
+    assert cache.get("a") is not None
+    monotonic.return_value = 1061.0
+    assert "a" not in cache
+    assert cache.get("a") is None
+    assert cache.info().evictions == 1
+    assert cache.info().currsize == 0
+
+
+def test_purges_expired_entries_when_adding(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    cache = PriceCache(ttl_seconds=60)
+    for i in range(50):
+        cache.put(i, make_history(10))
+    monotonic.return_value = 1030.0
+    cache.put("fresh", make_history(10))
+    monotonic.return_value = 1061.0
+    info = cache.info()
+    assert (info.currsize, info.evictions) == (1, 50)
+    assert info.nbytes == history_nbytes(make_history(10))
+    cache.put("new", make_history(10))
+    assert cache.keys() == ["fresh", "new"]
+
+
+def test_range_aware_lookups():
+    day = lambda d: pd.Timestamp(f"2020-01-{d:02}", tz="UTC")  # noqa: E731
+    cache = PriceCache()
+    cache.put("a", make_history(3), (day(5), day(10)))
+    assert cache.get("a", day(6), day(8)) is not None
+    assert cache.get("a", day(4), day(8)) is None
+    assert cache.get("a") is None
+    assert "a" not in cache
+    assert cache.peek("a").coverage == (day(5), day(10))
+    assert cache.info().hits == 1 and cache.info().misses == 2
+
+    assert missing_segments((day(5), day(10)), day(6), day(8)) == []
+    assert missing_segments((day(5), day(10)), None, day(12)) == [
+        (None, day(5)),
+        (day(10), day(12)),
+    ]
+    assert union((day(5), day(10)), day(1), None) == (day(1), None)
+
+
+def test_soft_ttl_marks_entries_stale(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    cache = PriceCache(ttl_seconds=60, soft_ttl_seconds=10)
+    cache.put("a", make_history(1))
+    assert not cache.is_stale("a")
+    monotonic.return_value = 1011.0
+    assert cache.is_stale("a")
+    assert cache.get("a") is not None  # Stale entries are still served
+    monotonic.return_value = 1061.0
+    assert not cache.is_stale("a")
+    assert cache.get("a") is None
+
+
+def test_lists_unexpired_keys(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    cache = PriceCache(ttl_seconds=60)
+    cache.put("a", make_history(1))
+    monotonic.return_value = 1030.0
+    cache.put("b", make_history(1))
+    cache.get("a")
+    assert cache.keys() == ["b", "a"]
+    monotonic.return_value = 1061.0
+    assert cache.keys() == ["b"]
+
+
+def test_negative_cache_remembers_permanent_failures_only(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    cache = NegativeCache(ttl_seconds=60)
+    not_found = SymbolNotFoundError(source="yahoo", query="XX")
+    cache.put("a", not_found)
+    cache.put("b", RateLimitHitError(source="yahoo"))
+    assert cache.get("a") is not_found
+    assert "b" not in cache and cache.get("b") is None
+    assert len(cache) == 1 and cache.hits == 1
+    monotonic.return_value = 1061.0
+    assert "a" not in cache and cache.get("a") is None
+    assert len(cache) == 0
@@ -1,10 +1,13 @@
 """Test the Coingecko API."""
 
-# pylint: disable=missing-docstring
+# pylint: disable=missing-docstring,protected-access
 
+import pandas as pd
 import pytest
+from tessa import price_history
 from tessa.price import coingecko
 from tessa.price.types import SymbolNotFoundError, CurrencyPreferenceNotFoundError
+from tessa.sources import get_source
 
 
 @pytest.mark.net
@@ -26,3 +29,119 @@ def test_error_non_existent_name():
     with pytest.raises(SymbolNotFoundError) as excinfo:
         coingecko.get_price_history("non-existent")
     assert "No symbol found" in str(excinfo.value)
+
+
+def test_days_since():
+    assert coingecko.days_since(None) == coingecko.MAX_DAYS
+    assert coingecko.days_since("2000-01-01") == coingecko.MAX_DAYS
+    three_days_ago = pd.Timestamp.now("UTC") - pd.Timedelta(days=2, hours=12)
+    assert coingecko.days_since(three_days_ago) == 3
+
+
+def test_get_latest_price(mocker):
+    mocker.patch(
+        "tessa.price.coingecko.CoinGeckoAPI.get_price",
+        return_value={"bitcoin": {"chf": 30000.0, "last_updated_at": 1672531200}},
+    )
+    df, crncy = coingecko.get_latest_price("bitcoin", "CHF")
+    assert crncy == "CHF"
+    assert df["close"].tolist() == [30000.0]
+    assert df.index[0] == pd.Timestamp("2023-01-01", tz="UTC")
+    with pytest.raises(CurrencyPreferenceNotFoundError):
+        coingecko.get_latest_price("bitcoin", "XYZ")
+    with pytest.raises(SymbolNotFoundError):
+        coingecko.get_latest_price("non-existent")
+
+
+def test_get_latest_prices_in_batches(mocker):
+    get_price = mocker.patch(
+        "tessa.price.coingecko.CoinGeckoAPI.get_price",
+        return_value={
+            "bitcoin": {"usd": 20000.0, "chf": 19000.0, "last_updated_at": 1672531200},
+            "ethereum": {"usd": 1500.0, "last_updated_at": 1672531200},
+        },
+    )
+    mocker.patch.object(coingecko, "MAX_IDS_PER_REQUEST", 2)
+    rate_limit = mocker.patch.object(get_source("coingecko").rate_limiter, "rate_limit")
+    res = coingecko.get_latest_prices(
+        ["bitcoin", "ethereum", "non-existent"], ["USD", "CHF"]
+    )
+    assert sorted(res) == [("bitcoin", "CHF"), ("bitcoin", "USD"), ("ethereum", "USD")]
+    df, crncy = res[("bitcoin", "CHF")]
+    assert crncy == "CHF"
+    assert df["close"].tolist() == [19000.0]
+    assert df.index[0] == pd.Timestamp("2023-01-01", tz="UTC")
+    assert get_price.call_count == 2
+    assert get_price.call_args_list[0].kwargs["ids"] == "bitcoin,ethereum"
+    assert get_price.call_args_list[0].kwargs["vs_currencies"] == "USD,CHF"
+    assert rate_limit.call_count == 1  # (The caller takes the token for the first.)
+
+    # A failing batch isn't mistaken for an unknown symbol:
+    get_price.side_effect = ValueError("Something went wrong")
+    with pytest.raises(ValueError) as excinfo:
+        coingecko.get_latest_prices(["bitcoin", "ethereum"], ["USD"])
+    assert not isinstance(excinfo.value, SymbolNotFoundError)
+
+
+def test_only_unknown_coins_raise_symbol_not_found(mocker):
+    market_chart = mocker.patch(
+        "tessa.price.coingecko.CoinGeckoAPI.get_coin_market_chart_by_id",
+        side_effect=ValueError({"error": "coin not found"}),
+    )
+    with pytest.raises(SymbolNotFoundError):
+        coingecko.get_price_history("non-existent")
+
+    market_chart.side_effect = ValueError(
+        {"status": {"error_code": 401, "error_message": "Invalid API key"}}
+    )
+    with pytest.raises(ValueError, match="Invalid API key") as excinfo:
+        coingecko.get_price_history("bitcoin")
+    assert not isinstance(excinfo.value, SymbolNotFoundError)
+
+
+def test_get_price_history_in_chunks(mocker):
+    def to_prices(start: pd.Timestamp, end: pd.Timestamp) -> list:
+        dates = pd.date_range(start.ceil("D"), end, freq="D", inclusive="left")
+        return [[d.timestamp() * 1000, float(d.year)] for d in dates]
+
+    now = pd.Timestamp.now("UTC")
+
+    def get_range(from_timestamp, to_timestamp, **_):
+        start = pd.Timestamp(int(from_timestamp), unit="s", tz="UTC")
+        end = pd.Timestamp(int(to_timestamp), unit="s", tz="UTC")
+        return {"prices": to_prices(start, end)}
+
+    def get_days(days, **_):
+        return {"prices": to_prices(now - pd.Timedelta(days=int(days)), now)}
+
+    ranges = mocker.patch(
+        "tessa.price.coingecko.CoinGeckoAPI.get_coin_market_chart_range_by_id",
+        side_effect=get_range,
+    )
+    mocker.patch(
+        "tessa.price.coingecko.CoinGeckoAPI.get_coin_market_chart_by_id",
+        side_effect=get_days,
+    )
+    mocker.patch.object(coingecko, "HISTORY_START", "2020-01-01")
+    rate_limit = mocker.patch.object(get_source("coingecko").rate_limiter, "rate_limit")
+    price_history.cache_clear()
+
+    df, _ = coingecko.get_price_history("bitcoin", "USD")
+    assert df.index[0] == pd.Timestamp("2020-01-01", tz="UTC")
+    assert df.index[-1] > now - pd.Timedelta(days=2)
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+    assert (df.index[1:] - df.index[:-1]).max() == pd.Timedelta(days=1)
+    chunks = ranges.call_count
+    assert chunks >= (now - pd.Timestamp("2020-01-01", tz="UTC")).days // 365
+    # A token for each request but the first (which the caller took one for):
+    assert rate_limit.call_count == chunks
+
+    # Completed chunks are only retrieved once:
+    df2, _ = coingecko.get_price_history("bitcoin", "USD", end="2022-01-01")
+    assert ranges.call_count == chunks
+    assert df2.index[-1] == pd.Timestamp("2021-12-31", tz="UTC")
+    assert rate_limit.call_count == chunks
+
+    # Clearing the price cache clears the completed chunks, too:
+    price_history.cache_clear()
+    assert not coingecko.COMPLETED_CHUNKS.keys()
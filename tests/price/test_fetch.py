@@ -0,0 +1,58 @@
+"""Test the concurrent fetching of price histories."""
+
+# pylint: disable=missing-docstring
+
+import threading
+import pandas as pd
+from tessa import price_history, sources
+from tessa.price import PriceHistory, PriceRequest, fetch_price_histories
+from tessa.price.types import SymbolNotFoundError
+
+
+def test_sources_are_fetched_concurrently(mocker):
+    coingecko_started = threading.Event()
+    history = PriceHistory(
+        pd.DataFrame({"close": [1.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)),
+        "USD",
+    )
+
+    def yahoo_get_price_history(query, *_, **__):
+        # Only succeeds if the coingecko request runs at the same time:
+        assert coingecko_started.wait(timeout=5)
+        if query == "BAD":
+            raise SymbolNotFoundError(source="yahoo", query=query)
+        return history
+
+    def coingecko_get_price_history(*_, **__):
+        coingecko_started.set()
+        return history
+
+    for name, func in [
+        ("yahoo", yahoo_get_price_history),
+        ("coingecko", coingecko_get_price_history),
+    ]:
+        mocker.patch.object(sources.get_source(name), "get_price_history", new=func)
+        mocker.patch.object(sources.get_source(name).rate_limiter, "rate_limit")
+
+    done = []
+    price_history.cache_clear()
+    try:
+        report = fetch_price_histories(
+            [
+                ("AAPL", "yahoo", "USD"),
+                ("BAD", "yahoo", "USD"),
+                ("bitcoin", "coingecko", "USD"),
+            ],
+            on_done=lambda request, error: done.append(request),
+        )
+    finally:
+        price_history.cache_clear()
+
+    assert set(report.results) == {
+        PriceRequest("AAPL", "yahoo", "USD"),
+        PriceRequest("bitcoin", "coingecko", "USD"),
+    }
+    assert isinstance(
+        report.errors[PriceRequest("BAD", "yahoo", "USD")], SymbolNotFoundError
+    )
+    assert len(done) == 3
@@ -0,0 +1,75 @@
+"""Test `price_panel`."""
+
+# pylint: disable=missing-docstring
+
+import pandas as pd
+import pytest
+from tessa import price_history, sources
+from tessa.price import PriceHistory, price_panel
+from tessa.price.types import SymbolNotFoundError
+from tessa.symbol import Symbol, SymbolCollection
+
+
+@pytest.fixture(autouse=True)
+def mock_sources(mocker):
+    histories = {
+        "A": PriceHistory(
+            pd.DataFrame(
+                {"close": [1.0, 2.0, 3.0]},
+                index=pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"]),
+            ).tz_localize("UTC"),
+            "USD",
+        ),
+        "b": PriceHistory(
+            pd.DataFrame(
+                {"close": [10.0, 30.0]},
+                index=pd.to_datetime(["2020-01-01", "2020-01-30"], utc=True),
+            ),
+            "CHF",
+        ),
+    }
+
+    def get_price_history(query, *_, **__):
+        if query not in histories:
+            raise SymbolNotFoundError(source="yahoo", query=query)
+        return histories[query]
+
+    for src in sources.get_all_sources():
+        mocker.patch.object(src, "get_price_history", new=get_price_history)
+        mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    yield
+    price_history.cache_clear()
+
+
+def test_price_panel_aligns_nearest_prices():
+    panel, currencies = price_panel(
+        ["A"], ["2020-01-05", "2020-01-02", "2020-02-20"], tolerance="3 days"
+    )
+    assert list(panel.index) == list(
+        pd.to_datetime(["2020-01-05", "2020-01-02", "2020-02-20"], utc=True)
+    )
+    assert panel["A"].iloc[0] == 3.0
+    assert panel["A"].iloc[1] == 2.0
+    assert pd.isna(panel["A"].iloc[2])
+    assert currencies == {"A": "USD"}
+
+
+def test_price_panel_works_on_symbol_collection():
+    sc = SymbolCollection([Symbol("a", query="A"), Symbol("b", source="coingecko")])
+    panel, currencies = sc.price_panel(["2020-01-02", "2020-01-20"], tolerance=None)
+    assert list(panel.columns) == ["a", "b"]
+    assert panel.loc["2020-01-20", "b"].item() == 30.0
+    assert currencies == {"a": "USD", "b": "CHF"}
+
+
+def test_price_panel_raises_on_failing_query():
+    with pytest.raises(SymbolNotFoundError):
+        price_panel(["A", "X"], ["2020-01-01"])
+
+
+def test_price_panel_raises_on_duplicate_columns():
+    with pytest.raises(ValueError, match="'A'"):
+        price_panel(["A", "A"], ["2020-01-01"])
+    with pytest.raises(ValueError, match="'a'"):
+        price_panel([Symbol("a", query="A"), "a"], ["2020-01-01"])
@@ -5,12 +5,23 @@ Note that tests will hit the network and therefore will take a while to run.
 
 # pylint: disable=missing-docstring
 
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import pandas as pd
 import pendulum
 import pytest
 from pandas.core.dtypes.dtypes import DatetimeTZDtype
-from tessa import price_history
+from tessa import price_history, price_history_many
 from tessa.price import PriceHistory
+from tessa.price.types import RateLimitHitError, SymbolNotFoundError
+from tessa.price.cache import CacheKey
+from tessa.price.retrieval import (
+    NEGATIVE_CACHE,
+    PRICE_CACHE,
+    REVALIDATION_DEADLINE,
+    cache_key,
+)
 from tessa import sources
 
 
@@ -74,3 +85,303 @@ def test_error_unsupported_asset_source():
     with pytest.raises(ValueError) as excinfo:
         price_history(query="AAPL", source="xxx")
     assert "Unknown source" in str(excinfo.value)
+
+
+def test_price_history_many_uses_batch_and_fills_cache(mocker):
+    def mock_df(close: float) -> pd.DataFrame:
+        df = pd.DataFrame(
+            {"close": [close]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+        )
+        df.index.name = "date"
+        return df
+
+    src = sources.get_source("yahoo")
+    results = {
+        "A": PriceHistory(mock_df(1.0), "usd"),
+        "XX": SymbolNotFoundError(source="yahoo", query="XX"),
+    }
+    batch = mocker.patch.object(
+        src,
+        "get_price_histories",
+        side_effect=lambda queries, _: {q: results[q] for q in queries if q in results},
+    )
+    single = mocker.patch.object(
+        src, "get_price_history", return_value=PriceHistory(mock_df(2.0), "EUR")
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        res = price_history_many(["A", "B", "A"])
+        assert list(res) == ["A", "B"]
+        assert res["A"].currency == "USD"
+        assert res["B"].df["close"].iloc[0] == 2.0
+        batch.assert_called_once_with(["A", "B"], "USD")
+        assert single.call_count == 1  # Only for "B", which failed in the batch
+
+        # Both are cached now:
+        price_history("A")
+        price_history("B")
+        assert batch.call_count == 1
+        assert single.call_count == 1
+
+        # Permanent failures in the batch are remembered, not retrieved again:
+        with pytest.raises(SymbolNotFoundError):
+            price_history_many(["A", "XX"])
+        batch.assert_called_with(["XX"], "USD")
+        assert single.call_count == 1
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_returns_copies(mocker):
+    mock_df = pd.DataFrame(
+        {"close": [100.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    mocker.patch.object(
+        sources.get_source("yahoo"),
+        "get_price_history",
+        return_value=(mock_df, "USD"),
+    )
+    price_history.cache_clear()
+    try:
+        df, _ = price_history("AAPL")
+        df["close"] = 0.0
+        assert price_history("AAPL").df["close"].iloc[0] == 100.0
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_without_copy_returns_read_only_view(mocker):
+    mock_df = pd.DataFrame(
+        {"close": [100.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    mocker.patch.object(
+        sources.get_source("yahoo"),
+        "get_price_history",
+        return_value=(mock_df, "USD"),
+    )
+    price_history.cache_clear()
+    try:
+        df, _ = price_history("AAPL", copy=False)
+        with pytest.raises(ValueError, match="read-only"):
+            df["close"].to_numpy()[0] = 0.0
+        df["other"] = 1.0
+        df2, _ = price_history("AAPL", copy=False)
+        assert list(df2.columns) == ["close"]
+        assert df2["close"].iloc[0] == 100.0
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_ranges_use_cache_and_fetch_missing_segments(mocker):
+    full = pd.DataFrame(
+        {"close": [float(i) for i in range(10)]},
+        index=pd.date_range("2020-01-01", periods=10, tz="UTC", name="date"),
+    )
+
+    def get_price_history(query, currency_preference, start=None, end=None):
+        keep = (full.index >= (start or full.index[0])) & (
+            full.index < (end or full.index[-1] + pd.Timedelta(days=1))
+        )
+        return PriceHistory(full[keep], "USD")
+
+    mocked = mocker.patch.object(
+        sources.get_source("yahoo"), "get_price_history", side_effect=get_price_history
+    )
+    mocker.patch.object(sources.get_source("yahoo").rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        df, _ = price_history("AAPL", start="2020-01-03", end="2020-01-07")
+        assert df["close"].tolist() == [2.0, 3.0, 4.0, 5.0]
+
+        # Narrower range is served from the cache:
+        df, _ = price_history("AAPL", start="2020-01-04", end="2020-01-06")
+        assert df["close"].tolist() == [3.0, 4.0]
+        assert mocked.call_count == 1
+
+        # Wider range only retrieves the missing segments:
+        df, _ = price_history("AAPL", start="2020-01-02", end="2020-01-09")
+        assert df["close"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+        assert [c.kwargs["start"] for c in mocked.call_args_list[1:]] == [
+            pd.Timestamp("2020-01-02", tz="UTC"),
+            pd.Timestamp("2020-01-07", tz="UTC"),
+        ]
+        assert [c.kwargs["end"] for c in mocked.call_args_list[1:]] == [
+            pd.Timestamp("2020-01-03", tz="UTC"),
+            pd.Timestamp("2020-01-09", tz="UTC"),
+        ]
+
+        # The full history only retrieves the open ends:
+        df, _ = price_history("AAPL")
+        assert df.equals(full)
+        assert mocked.call_count == 5
+        assert ("AAPL", "yahoo", "USD") in PRICE_CACHE
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_coalesces_concurrent_retrievals(mocker):
+    mock_df = pd.DataFrame(
+        {"close": [100.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    release = threading.Event()
+
+    def get_price_history(*_, **__):
+        release.wait(5)
+        return PriceHistory(mock_df, "USD")
+
+    mocked = mocker.patch.object(
+        sources.get_source("yahoo"), "get_price_history", side_effect=get_price_history
+    )
+    mocker.patch.object(sources.get_source("yahoo").rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [executor.submit(price_history, "AAPL") for _ in range(10)]
+            while mocked.call_count == 0:
+                time.sleep(0.01)
+            time.sleep(0.1)
+            release.set()
+            assert all(f.result().currency == "USD" for f in futures)
+        assert mocked.call_count == 1
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_deadline(mocker):
+    mocker.patch.object(
+        sources.get_source("yahoo"),
+        "get_price_history",
+        side_effect=RateLimitHitError(source="yahoo"),
+    )
+    mocker.patch.object(sources.get_source("yahoo").rate_limiter, "rate_limit")
+    sleep = mocker.patch("time.sleep")
+    price_history.cache_clear()
+    try:
+        with pytest.raises(TimeoutError):
+            price_history("AAPL", deadline=1)
+        sleep.assert_not_called()
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_stale_while_revalidate(mocker):
+    def mock_df(close: float) -> pd.DataFrame:
+        return pd.DataFrame(
+            {"close": [close]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+        )
+
+    closes, threads = iter([1.0, 2.0]), []
+
+    def get_price_history(*_, **__) -> PriceHistory:
+        threads.append(threading.current_thread().name)
+        return PriceHistory(mock_df(next(closes)), "USD")
+
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src, "get_price_history", side_effect=get_price_history
+    )
+    bruteforcefully = mocker.spy(src, "get_price_history_bruteforcefully")
+    rate_limit = mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    mocker.patch.object(PRICE_CACHE, "soft_ttl_seconds", 0)
+
+    def cached_close() -> float:
+        return PRICE_CACHE.peek(("AAPL", "yahoo", "USD")).history.df["close"].iloc[0]
+
+    try:
+        assert price_history("AAPL").df["close"].iloc[0] == 1.0
+        # Stale, so the stale history is returned and refreshed in the background:
+        assert price_history("AAPL").df["close"].iloc[0] == 1.0
+        for _ in range(100):
+            if cached_close() == 2.0:
+                break
+            time.sleep(0.01)
+        assert cached_close() == 2.0
+        assert mocked.call_count == 2
+        assert rate_limit.call_count == 2
+        # The refresh runs in the refresh pool, gives up retrying in time, and only
+        # retrieves the tail (plus an overlap):
+        refresh_call = bruteforcefully.call_args_list[1]
+        assert refresh_call.kwargs["retry_policy"].deadline == REVALIDATION_DEADLINE
+        assert refresh_call.kwargs["start"] == pd.Timestamp("2019-12-25", tz="UTC")
+        assert refresh_call.kwargs["end"] is None
+        assert threads[1].startswith("tessa-revalidate")
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_only_retrieves_the_tail_of_expired_histories(mocker):
+    index = pd.to_datetime(["2020-01-01", "2020-01-10"], utc=True)
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src,
+        "get_price_history",
+        side_effect=[
+            PriceHistory(pd.DataFrame({"close": [1.0, 2.0]}, index=index), "USD"),
+            PriceHistory(pd.DataFrame({"close": [3.0]}, index=index[1:]), "USD"),
+        ],
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    mocker.patch.object(PRICE_CACHE, "ttl_seconds", 0.05)
+    try:
+        price_history("AAPL")
+        time.sleep(0.1)
+        assert price_history("AAPL").df["close"].tolist() == [1.0, 3.0]
+        _, kwargs = mocked.call_args
+        assert kwargs["start"] == pd.Timestamp("2020-01-03", tz="UTC")
+        assert kwargs["end"] is None
+    finally:
+        price_history.cache_clear()
+
+
+def test_price_history_remembers_permanent_failures(mocker):
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src,
+        "get_price_history",
+        side_effect=SymbolNotFoundError(source="yahoo", query="XX"),
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        for _ in range(3):
+            with pytest.raises(SymbolNotFoundError):
+                price_history("XX")
+        assert mocked.call_count == 1
+        assert ("XX", "yahoo", "USD") in NEGATIVE_CACHE
+
+        # Transient failures aren't remembered:
+        mocked.side_effect = RateLimitHitError(source="yahoo")
+        mocker.patch("time.sleep")
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                price_history("YY", deadline=1)
+        assert ("YY", "yahoo", "USD") not in NEGATIVE_CACHE
+        assert mocked.call_count == 3
+    finally:
+        price_history.cache_clear()
+        src.circuit_breaker.reset()
+    assert len(NEGATIVE_CACHE) == 0
+
+
+def test_equivalent_calls_share_one_cache_entry(mocker):
+    mock_df = pd.DataFrame(
+        {"close": [1.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src, "get_price_history", return_value=PriceHistory(mock_df, "USD")
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        price_history("AAPL")
+        price_history(query="aapl ", source="Yahoo", currency_preference="usd")
+        price_history("AAPL", "yahoo", "Usd", False)
+        assert mocked.call_count == 1
+        assert price_history.cache_keys() == [CacheKey("AAPL", "yahoo", "USD")]
+    finally:
+        price_history.cache_clear()
+    assert cache_key(" Bitcoin", "coingecko", "chf") == ("bitcoin", "coingecko", "CHF")
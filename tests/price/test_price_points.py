@@ -2,8 +2,16 @@
 
 import pytest
 import pandas as pd
-from tessa import price_point, price_point_strict, price_latest
+from tessa import (
+    price_point,
+    price_points,
+    price_point_strict,
+    price_latest,
+    price_latest_many,
+)
 from tessa.price import PriceHistory, PricePoint
+from tessa.price.types import CircuitOpenError
+from tessa import sources
 
 
 # pylint: disable=unused-argument,missing-function-docstring,redefined-outer-name
@@ -25,6 +33,8 @@ def mock_price_history(mocker):
         "tessa.price.price.price_history",
         return_value=PriceHistory(pd.DataFrame(df_as_json).set_index("date"), "USD"),
     )
+    # Make `price_latest` use the (mocked) history, too:
+    mocker.patch.object(sources.get_source("yahoo"), "get_latest_price", None)
 
 
 def test_price_point_strict(mock_price_history):
@@ -89,3 +99,113 @@ def test_concrete_coingecko_price_point():
     assert pd.Timestamp.now("utc") - res.when < pd.Timedelta("7 days")
     assert res.price > 0
     assert res.currency == "USD"
+
+
+def test_price_points_match_price_point(mock_price_history):
+    whens = ["2018-01-13", "2017-01-01", "2018-01-11 12:00", "2018-01-11"]
+    res = price_points("xx", whens)
+    assert list(res.columns) == ["when", "price", "currency"]
+    assert len(res) == len(whens)
+    for when, row in zip(whens, res.itertuples()):
+        assert price_point("xx", when) == PricePoint(row.when, row.price, row.currency)
+
+
+def test_price_points_masks_deviations(mock_price_history):
+    res = price_points(
+        "xx", pd.DatetimeIndex(["2018-01-13", "2022-01-01"]), max_date_deviation_days=1
+    )
+    assert res["price"].iloc[0] == 3.0
+    assert pd.isna(res["price"].iloc[1])
+    assert pd.isna(res["when"].iloc[1])
+
+    res = price_points("xx", pd.Series(["2022-01-01"]), max_date_deviation_days=None)
+    assert res["price"].iloc[0] == 3.0
+
+
+def test_price_latest_uses_lightweight_retrieval(mocker):
+    src = sources.get_source("yahoo")
+    latest = PriceHistory(
+        pd.DataFrame({"close": [5.0]}, index=[pd.Timestamp("2022-01-03", tz="utc")]),
+        "usd",
+    )
+    get_latest_price = mocker.patch.object(src, "get_latest_price", return_value=latest)
+    get_price_history = mocker.patch.object(src, "get_price_history")
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_latest.cache_clear()
+    try:
+        expected = PricePoint(pd.Timestamp("2022-01-03", tz="utc"), 5.0, "USD")
+        assert price_latest("xx") == expected
+        assert price_latest("xx") == expected
+    finally:
+        price_latest.cache_clear()
+    get_latest_price.assert_called_once_with("XX", "USD")  # (Normalized.)
+    get_price_history.assert_not_called()
+
+
+def test_price_latest_many_uses_batch(mocker):
+    src = sources.get_source("coingecko")
+
+    def latest(close: float, currency: str) -> PriceHistory:
+        index = [pd.Timestamp("2022-01-03", tz="utc")]
+        return PriceHistory(pd.DataFrame({"close": [close]}, index=index), currency)
+
+    batch = mocker.patch.object(
+        src,
+        "get_latest_prices",
+        return_value={
+            ("a", "USD"): latest(1.0, "usd"),
+            ("a", "CHF"): latest(2.0, "CHF"),
+        },
+    )
+    single = mocker.patch.object(
+        src, "get_latest_price", return_value=latest(3.0, "USD")
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_latest.cache_clear()
+    try:
+        res = price_latest_many(["a", "b", "a"], "coingecko", ["USD", "CHF"])
+        assert list(res) == [("a", "USD"), ("a", "CHF"), ("b", "USD"), ("b", "CHF")]
+        assert res[("a", "USD")] == PricePoint(
+            pd.Timestamp("2022-01-03", tz="utc"), 1.0, "USD"
+        )
+        assert res[("a", "CHF")].price == 2.0
+        assert res[("b", "USD")].price == 3.0
+        batch.assert_called_once_with(["a", "b"], ["USD", "CHF"])
+        assert single.call_count == 2  # Only for "b", which wasn't found in the batch
+
+        # All are cached now:
+        price_latest_many(["a", "b"], "coingecko", ["USD", "CHF"])
+        assert price_latest("a", "coingecko", "CHF").price == 2.0
+        assert batch.call_count == 1
+        assert single.call_count == 2
+    finally:
+        price_latest.cache_clear()
+
+
+def test_price_latest_many_falls_back_if_the_batch_fails(mocker):
+    src = sources.get_source("coingecko")
+    index = [pd.Timestamp("2022-01-03", tz="utc")]
+    batch = mocker.patch.object(
+        src, "get_latest_prices", side_effect=ValueError("Something went wrong")
+    )
+    single = mocker.patch.object(
+        src,
+        "get_latest_price",
+        return_value=PriceHistory(pd.DataFrame({"close": [3.0]}, index=index), "USD"),
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_latest.cache_clear()
+    try:
+        res = price_latest_many(["a", "b"], "coingecko")
+        assert [point.price for point in res.values()] == [3.0, 3.0]
+        batch.assert_called_once()
+        assert single.call_count == 2
+
+        # Unless the source as a whole is failing:
+        price_latest.cache_clear()
+        batch.side_effect = CircuitOpenError(5, 60)
+        with pytest.raises(CircuitOpenError):
+            price_latest_many(["a", "b"], "coingecko")
+        assert single.call_count == 2
+    finally:
+        price_latest.cache_clear()
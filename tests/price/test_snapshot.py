@@ -0,0 +1,60 @@
+"""Test cache snapshots."""
+
+# pylint: disable=missing-docstring
+
+import pandas as pd
+import pytest
+from tessa import price_history, sources
+from tessa.price import PriceHistory, cache_export, cache_import
+from tessa.price.cache import CacheKey
+from tessa.price.retrieval import PRICE_CACHE
+
+pytest.importorskip("pyarrow")
+
+
+def make_history(closes: list, currency: str = "USD") -> PriceHistory:
+    index = pd.date_range("2020-01-01", periods=len(closes), tz="UTC", name="date")
+    return PriceHistory(pd.DataFrame({"close": closes}, index=index), currency)
+
+
+def test_export_and_import_restore_the_cache(tmp_path, mocker):
+    path = str(tmp_path / "prices.parquet")
+    coverage = (
+        pd.Timestamp("2020-01-01", tz="UTC"),
+        pd.Timestamp("2020-01-03", tz="UTC"),
+    )
+    price_history.cache_clear()
+    try:
+        PRICE_CACHE.put(CacheKey("AAPL", "yahoo", "USD"), make_history([1.0, 2.0]))
+        PRICE_CACHE.put(
+            CacheKey("bitcoin", "coingecko", "CHF"),
+            make_history([3.0, 4.0], "CHF"),
+            coverage,
+            age_seconds=60,
+        )
+        PRICE_CACHE.put(CacheKey("EMPTY", "yahoo", "USD"), make_history([]))
+        assert cache_export(path) == 3
+
+        price_history.cache_clear()
+        assert cache_import(path) == 3
+        assert len(PRICE_CACHE.keys()) == 3
+        entry = PRICE_CACHE.peek(("bitcoin", "coingecko", "CHF"))
+        assert entry.coverage == coverage
+        assert entry.history.currency == "CHF"
+        pd.testing.assert_frame_equal(
+            entry.history.df, make_history([3.0, 4.0]).df, check_freq=False
+        )
+        assert PRICE_CACHE.peek(("EMPTY", "yahoo", "USD")).history.df.empty
+
+        # Served from the imported cache without hitting the network:
+        mocked = mocker.patch.object(sources.get_source("yahoo"), "get_price_history")
+        assert price_history("AAPL").df["close"].tolist() == [1.0, 2.0]
+        mocked.assert_not_called()
+
+        # Entries keep their age, so expired ones are skipped:
+        price_history.cache_clear()
+        mocker.patch.object(PRICE_CACHE, "ttl_seconds", 30)
+        assert cache_import(path) == 2
+        assert ("bitcoin", "coingecko", "CHF") not in PRICE_CACHE.keys()
+    finally:
+        price_history.cache_clear()
@@ -0,0 +1,113 @@
+"""Test the persistent price history stores."""
+
+# pylint: disable=missing-docstring,redefined-outer-name
+
+import pandas as pd
+import pendulum
+import pytest
+from tessa import price_history, sources
+from tessa.price import PriceHistory
+from tessa.price.store import (
+    FreshnessPolicy,
+    SQLitePriceStore,
+    StoredPriceHistory,
+    set_price_store,
+)
+
+
+@pytest.fixture()
+def history():
+    df = pd.DataFrame(
+        {"close": [100.0, 101.0]},
+        index=pd.to_datetime(["2020-01-01", "2020-01-02"], utc=True),
+    )
+    df.index.name = "date"
+    return PriceHistory(df, "USD")
+
+
+@pytest.fixture()
+def store(tmp_path):
+    store = SQLitePriceStore(str(tmp_path / "prices.sqlite"))
+    set_price_store(store)
+    price_history.cache_clear()
+    yield store
+    set_price_store(None)
+    price_history.cache_clear()
+
+
+def test_sqlite_store_roundtrip(store, history):
+    assert store.get("yahoo", "AAPL", "USD") is None
+    store.put("yahoo", "AAPL", "USD", history)
+    stored = store.get("yahoo", "AAPL", "USD")
+    assert stored.history.currency == "USD"
+    pd.testing.assert_frame_equal(
+        stored.history.df, history.df, check_freq=False, check_index_type=False
+    )
+    assert store.get("yahoo", "AAPL", "CHF") is None
+    store.clear()
+    assert store.get("yahoo", "AAPL", "USD") is None
+
+
+def test_freshness_policy(history):
+    policy = FreshnessPolicy(max_age_hours=1)
+    assert policy.is_fresh(StoredPriceHistory(history, pendulum.now()))
+    old = pendulum.now().subtract(hours=2)
+    assert not policy.is_fresh(StoredPriceHistory(history, old))
+
+
+def test_price_history_uses_and_fills_store(store, history, mocker):
+    mocked = mocker.patch.object(
+        sources.get_source("yahoo"), "get_price_history", return_value=history
+    )
+    price_history("AAPL")
+    assert mocked.call_count == 1
+    assert store.get("yahoo", "AAPL", "USD") is not None
+
+    # Simulate a restart -- the store should be used instead of the network:
+    price_history.cache_clear()
+    df, currency = price_history("AAPL")
+    assert mocked.call_count == 1
+    assert currency == "USD"
+    assert df["close"].tolist() == [100.0, 101.0]
+
+
+def test_price_history_ignores_stale_entries(store, history, mocker):
+    store.put("yahoo", "AAPL", "USD", history, pendulum.now().subtract(days=2))
+    mocked = mocker.patch.object(
+        sources.get_source("yahoo"), "get_price_history", return_value=history
+    )
+    mocker.patch.object(sources.get_source("yahoo").rate_limiter, "rate_limit")
+    price_history("AAPL")
+    assert mocked.call_count == 1
+
+
+def test_price_history_refreshes_incrementally(tmp_path, history, mocker):
+    store = SQLitePriceStore(
+        str(tmp_path / "prices.sqlite"),
+        FreshnessPolicy(incremental=True, overlap_days=1),
+    )
+    store.put("yahoo", "AAPL", "USD", history, pendulum.now().subtract(days=2))
+    tail = pd.DataFrame(
+        {"close": [111.0, 102.0]},
+        index=pd.to_datetime(["2020-01-02", "2020-01-03"], utc=True),
+    )
+    mocked = mocker.patch.object(
+        sources.get_source("yahoo"),
+        "get_price_history",
+        return_value=PriceHistory(tail, "USD"),
+    )
+    mocker.patch.object(sources.get_source("yahoo").rate_limiter, "rate_limit")
+    set_price_store(store)
+    price_history.cache_clear()
+    try:
+        df, _ = price_history("AAPL")
+    finally:
+        set_price_store(None)
+        price_history.cache_clear()
+    assert mocked.call_args.kwargs["start"] == pd.Timestamp("2020-01-01", tz="UTC")
+    assert df["close"].tolist() == [100.0, 111.0, 102.0]
+    assert store.get("yahoo", "AAPL", "USD").history.df["close"].tolist() == [
+        100.0,
+        111.0,
+        102.0,
+    ]
@@ -2,8 +2,13 @@
 
 # pylint: disable=missing-docstring
 
+import pandas as pd
 import pytest
-from tessa.price import yahoo
+from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+from tessa import price_history
+from tessa.price import PriceHistory, yahoo
+from tessa.price.types import CircuitOpenError, SymbolNotFoundError
+from tessa.sources import get_source
 
 
 @pytest.mark.parametrize(
@@ -29,3 +34,96 @@ def test_api_returns_reasonable_data(query: str, expected_currency: str):
 def test_non_existing_query_raises():
     with pytest.raises(Exception):
         yahoo.get_price_history("thisshouldntexistreally")
+
+
+def test_unknown_tickers_raise_symbol_not_found(mocker):
+    ticker = mocker.patch("yfinance.Ticker")
+    ticker.return_value.history.side_effect = YFTzMissingError("XX")
+    with pytest.raises(SymbolNotFoundError):
+        yahoo.get_price_history("XX")
+
+    ticker.return_value.history.side_effect = YFPricesMissingError("XX", "")
+    with pytest.raises(SymbolNotFoundError):
+        yahoo.get_price_history("XX")
+
+    # A range without prices doesn't mean the ticker is unknown:
+    ticker.return_value._price_history._history_metadata = {"currency": "USD"}
+    df, currency = yahoo.get_price_history("XX", start="2020-01-04", end="2020-01-06")
+    assert df.empty and currency == "USD"
+
+
+def test_price_history_widens_cached_range_by_days_without_trades(mocker):
+    full = pd.DataFrame(
+        {"Close": [1.0, 2.0, 3.0]},
+        index=pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"], utc=True),
+    )
+    ticker = mocker.patch("yfinance.Ticker")
+    ticker.return_value._price_history._history_metadata = {"currency": "USD"}
+
+    def history(start, end, **_):
+        df = full[(full.index >= pd.Timestamp(start)) & (full.index < end)]
+        if df.empty:
+            raise YFPricesMissingError("AAPL", "")
+        return df
+
+    ticker.return_value.history.side_effect = history
+    mocker.patch.object(get_source("yahoo").rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    try:
+        price_history("AAPL", start="2020-01-01", end="2020-01-04")
+        # Only the weekend is missing:
+        df, _ = price_history("AAPL", start="2020-01-01", end="2020-01-06")
+        assert df["close"].tolist() == [1.0, 2.0, 3.0]
+        assert ticker.return_value.history.call_count == 2
+    finally:
+        price_history.cache_clear()
+
+
+def test_get_price_histories_goes_through_the_source(mocker):
+    history = PriceHistory(
+        pd.DataFrame({"close": [1.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)),
+        "USD",
+    )
+
+    def get_price_history(query, *_, **__):
+        if query == "BAD":
+            raise ValueError("No data")
+        if query == "XX":
+            raise SymbolNotFoundError(source="yahoo", query=query)
+        return history
+
+    src = get_source("yahoo")
+    mocker.patch.object(src, "get_price_history", side_effect=get_price_history)
+    rate_limit = mocker.patch.object(src.rate_limiter, "rate_limit")
+    res = yahoo.get_price_histories(["A", "BAD", "XX", "B"])
+    assert list(res) == ["A", "XX", "B"]
+    assert isinstance(res["XX"], SymbolNotFoundError)  # (Permanent errors are kept.)
+    assert rate_limit.call_count == 4  # One token per ticker
+
+    # Errors concerning the source abort the batch:
+    src.get_price_history.side_effect = CircuitOpenError(5, 60)
+    with pytest.raises(CircuitOpenError):
+        yahoo.get_price_histories(["A", "B"])
+
+
+def test_get_latest_price_falls_back_to_full_history(mocker):
+    full = pd.DataFrame(
+        {"Close": [1.0, 2.0]}, index=pd.to_datetime(["2020-01-01", "2020-01-02"])
+    )
+    ticker = mocker.patch("yfinance.Ticker")
+    ticker.return_value._price_history._history_metadata = {"currency": "USD"}
+
+    def history(period=None, **_):
+        if period is not None:
+            raise YFPricesMissingError("XX", "")
+        return full
+
+    ticker.return_value.history.side_effect = history
+    df, currency = yahoo.get_latest_price("XX")
+    assert df["close"].tolist() == [2.0]
+    assert currency == "USD"
+
+    ticker.return_value.history.side_effect = lambda period=None, **_: (
+        full.iloc[:0] if period else full
+    )
+    assert yahoo.get_latest_price("XX").df["close"].tolist() == [2.0]
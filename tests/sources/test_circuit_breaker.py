@@ -0,0 +1,140 @@
+"""Test the circuit breaker."""
+
+# pylint: disable=missing-docstring
+
+import time
+import pandas as pd
+import pendulum
+import pytest
+import requests
+from tessa import price_history, price_latest
+from tessa.price import PriceHistory
+from tessa.price.retrieval import LATEST_PRICE_CACHE, PRICE_CACHE
+from tessa.price.store import SQLitePriceStore, set_price_store
+from tessa.price.types import CircuitOpenError, SymbolNotFoundError
+from tessa.sources import Source, get_source, rate_limiter
+from tessa.sources.circuit_breaker import CircuitBreaker
+
+
+def server_error(*_, **__):
+    response = requests.Response()
+    response.status_code = 503
+    raise requests.HTTPError(response=response)
+
+
+def test_opens_half_opens_and_closes(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=1000.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError, match="2 times in a row"):
+        breaker.before_call()
+
+    monotonic.return_value = 1061.0
+    assert breaker.state == "half-open"
+    breaker.before_call()  # The probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    monotonic.return_value = 1122.0
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.info() == ("closed", 0, 2, 2)
+
+
+def test_source_fails_fast_while_open(mocker):
+    mocker.patch("warnings.warn")
+    func = mocker.Mock(side_effect=server_error)
+    source = Source(
+        get_price_history=func,
+        get_search_results=None,
+        rate_limiter=rate_limiter.RateLimiter(wait_seconds=0),
+        circuit_breaker=CircuitBreaker(failure_threshold=3),
+    )
+    with pytest.raises(CircuitOpenError):
+        source.get_price_history_bruteforcefully("BTC")
+    assert func.call_count == 3
+    with pytest.raises(CircuitOpenError):
+        source.get_price_history_bruteforcefully("BTC")
+    assert func.call_count == 3
+
+
+def test_source_doesnt_count_unknown_symbols():
+    def not_found(query, *_, **__):
+        raise SymbolNotFoundError(source="coingecko", query=query)
+
+    source = Source(
+        get_price_history=not_found,
+        get_search_results=None,
+        rate_limiter=rate_limiter.RateLimiter(wait_seconds=0),
+        circuit_breaker=CircuitBreaker(failure_threshold=1),
+    )
+    for _ in range(3):
+        with pytest.raises(SymbolNotFoundError):
+            source.get_price_history_bruteforcefully("XXX")
+    assert source.circuit_breaker.state == "closed"
+
+
+def test_price_history_serves_stale_data_while_open(mocker, tmp_path):
+    df = pd.DataFrame(
+        {"close": [100.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    df.index.name = "date"
+    store = SQLitePriceStore(str(tmp_path / "prices.sqlite"))
+    store.put(
+        "yahoo", "AAPL", "USD", PriceHistory(df, "USD"), pendulum.now().subtract(days=9)
+    )
+    src = get_source("yahoo")
+    mocker.patch.object(src, "get_price_history", side_effect=server_error)
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    mocker.patch.object(src, "circuit_breaker", CircuitBreaker(failure_threshold=1))
+    set_price_store(store)
+    price_history.cache_clear()
+    try:
+        with pytest.warns(RuntimeWarning, match="stale price history"):
+            stale, currency = price_history("AAPL")
+        assert currency == "USD"
+        assert stale["close"].tolist() == [100.0]
+        with pytest.raises(CircuitOpenError):
+            price_history("MSFT")
+    finally:
+        set_price_store(None)
+        price_history.cache_clear()
+
+
+def test_expired_cache_entries_are_served_while_open(mocker):
+    df = pd.DataFrame(
+        {"close": [100.0]}, index=pd.to_datetime(["2020-01-01"], utc=True)
+    )
+    src = get_source("yahoo")
+    get_history = mocker.patch.object(
+        src, "get_price_history", return_value=PriceHistory(df, "USD")
+    )
+    get_latest = mocker.patch.object(
+        src, "get_latest_price", return_value=PriceHistory(df, "USD")
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    mocker.patch.object(src, "circuit_breaker", CircuitBreaker(failure_threshold=1))
+    mocker.patch.object(PRICE_CACHE, "ttl_seconds", 0.05)
+    mocker.patch.object(LATEST_PRICE_CACHE, "ttl_seconds", 0.05)
+    price_history.cache_clear()
+    price_latest.cache_clear()
+    try:
+        price_history("AAPL")
+        price_latest("MSFT")
+        time.sleep(0.1)
+        get_history.side_effect = get_latest.side_effect = server_error
+        with pytest.warns(RuntimeWarning, match="stale price history"):
+            assert price_history("AAPL").df["close"].tolist() == [100.0]
+        assert src.circuit_breaker.state == "open"
+        with pytest.warns(RuntimeWarning, match="stale price history"):
+            assert price_history("AAPL").df["close"].tolist() == [100.0]
+        with pytest.warns(RuntimeWarning, match="stale price history"):
+            assert price_latest("MSFT").price == 100.0
+    finally:
+        price_history.cache_clear()
+        price_latest.cache_clear()
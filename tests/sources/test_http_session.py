@@ -0,0 +1,82 @@
+"""Test the shared HTTP sessions."""
+
+# pylint: disable=missing-docstring,protected-access
+
+import pandas as pd
+import pytest
+import requests
+from yfinance.data import YfData
+from tessa.price import coingecko, yahoo
+from tessa.sources import get_source
+from tessa.sources.http_session import (
+    HttpSession,
+    curl_cffi_session,
+    yfinance_session,
+)
+
+
+def test_session_is_created_once_and_recreated_after_close():
+    http_session = HttpSession()
+    session = http_session.get()
+    assert isinstance(session, requests.Session)
+    assert http_session.get() is session
+    http_session.close()
+    assert http_session.get() is not session
+
+
+def test_requests_session_is_configured(mocker):
+    session = HttpSession(pool_size=3, timeout=5, keep_alive=False).get()
+    adapter = session.get_adapter("https://api.coingecko.com")
+    assert adapter._pool_maxsize == 3
+    assert session.headers["Connection"] == "close"
+
+    # The timeout applies to requests that don't set their own:
+    send = mocker.patch(
+        "requests.adapters.HTTPAdapter.send", side_effect=requests.ConnectionError
+    )
+    with pytest.raises(requests.ConnectionError):
+        session.get("https://api.coingecko.com")
+    assert send.call_args.kwargs["timeout"] == 5
+    with pytest.raises(requests.ConnectionError):
+        session.get("https://api.coingecko.com", timeout=1)
+    assert send.call_args.kwargs["timeout"] == 1
+
+
+def test_curl_cffi_session_is_configured():
+    session = HttpSession(timeout=5, factory=curl_cffi_session).get()
+    assert session.timeout == 5
+    assert session.impersonate == "chrome"
+
+
+def test_coingecko_calls_share_the_source_session(mocker):
+    http_session = get_source("coingecko").http_session
+    assert coingecko.get_api() is coingecko.get_api()
+    assert coingecko.get_api().session is http_session.get()
+    assert coingecko.get_api().request_timeout == http_session.timeout
+
+    request = mocker.patch.object(http_session.get(), "get")
+    request.return_value.content = b'{"bitcoin": {"usd": 1.0, "last_updated_at": 0}}'
+    coingecko.get_latest_price("bitcoin")
+    coingecko.get_latest_price("bitcoin")
+    assert request.call_count == 2
+
+
+def test_yfinance_session_is_set_once(mocker):
+    set_session = mocker.patch.object(YfData, "_set_session")
+    session = HttpSession(factory=yfinance_session).get()
+    set_session.assert_called_once_with(session)
+
+
+def test_yahoo_calls_share_the_source_session(mocker):
+    http_session = get_source("yahoo").http_session
+    http_session.close()
+    ticker = mocker.patch("yfinance.Ticker")
+    ticker.return_value.history.return_value = pd.DataFrame(
+        {"Close": [1.0]}, index=pd.to_datetime(["2020-01-01"])
+    )
+    ticker.return_value._price_history._history_metadata = {"currency": "USD"}
+    yahoo.get_price_history("AAPL")
+    yahoo.get_latest_price("AAPL")
+    assert YfData()._session is http_session.get()
+    # (yfinance's global session isn't replaced with every ticker:)
+    assert all("session" not in c.kwargs for c in ticker.call_args_list)
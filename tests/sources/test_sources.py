@@ -1,12 +1,15 @@
 """Sources-related tests."""
 
-# pylint: disable=missing-docstring
+# pylint: disable=missing-docstring,protected-access
 
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
 import time
 import warnings
 import pytest
 import requests
-from tessa.price.types import RateLimitHitError
+from tessa.price.types import RateLimitHitError, RetryDeadlineExceededError
+from tessa.sources.retry import RetryPolicy
 from tessa.sources import rate_limiter, Source, sources
 from tessa.price import PriceHistory
 
@@ -112,3 +115,145 @@ def test_get_price_history_bruteforcefully_rate_limit_hit(mocker):
     warnings.warn.assert_called_once_with(
         "Rate limit hit (429). Backing off 10 seconds. (1/100)"
     )
+
+
+def test_rate_limit_books_slots_for_concurrent_callers(mocker):
+    sleep = mocker.patch("time.sleep")
+    limiter = rate_limiter.RateLimiter(wait_seconds=1)
+    limiter.rate_limit()
+    limiter.rate_limit()
+    limiter.rate_limit()
+    # The third caller has to wait for the second one's slot, i.e., ~2 seconds:
+    assert sleep.call_count == 2
+    assert 1.5 < sleep.call_args_list[1].args[0] <= 2
+    assert limiter.count_all_calls == 3
+    assert limiter.count_limited_calls == 2
+
+
+def test_token_bucket_allows_bursts_then_spaces_calls(mocker):
+    sleep = mocker.patch("time.sleep")
+    limiter = rate_limiter.TokenBucketRateLimiter(rate=30, burst=3, window=60)
+    for _ in range(5):
+        limiter.rate_limit()
+    # The first 3 calls use up the burst, then calls are spaced 2 seconds apart:
+    assert sleep.call_count == 2
+    assert 1.5 < sleep.call_args_list[0].args[0] <= 2
+    assert 3.5 < sleep.call_args_list[1].args[0] <= 4
+    assert limiter.count_all_calls == 5
+    assert limiter.count_limited_calls == 2
+    limiter.reset()
+    limiter.rate_limit()
+    assert sleep.call_count == 2
+
+
+def test_token_bucket_is_thread_safe():
+    limiter = rate_limiter.TokenBucketRateLimiter(rate=1, burst=1, window=60)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        waits = list(executor.map(lambda _: limiter._book_call(), range(40)))
+    # Every caller got its own slot, one minute apart:
+    assert sorted(round(w / 60) for w in waits) == list(range(40))
+    assert limiter.count_all_calls == 40
+
+
+def _book_shared_call(directory: str) -> float:
+    limiter = rate_limiter.SharedRateLimiter(
+        name="test", directory=directory, rate=1, window=60
+    )
+    return limiter._book_call()
+
+
+def test_shared_rate_limiter_shares_bucket_across_instances(tmp_path):
+    first, second = (
+        rate_limiter.SharedRateLimiter(
+            name="test", directory=str(tmp_path), rate=1, burst=2, window=60
+        )
+        for _ in range(2)
+    )
+    assert first._book_call() == 0
+    assert second._book_call() == 0
+    assert 59 < first._book_call() <= 60  # Bucket is empty for both now
+    assert 119 < second._book_call() <= 120
+    assert isinstance(first, rate_limiter.RateLimiter)
+    first.reset()
+    assert second._book_call() == 0
+
+
+def test_shared_rate_limiter_shares_bucket_across_processes(tmp_path):
+    with multiprocessing.Pool(4) as pool:
+        waits = pool.map(_book_shared_call, [str(tmp_path)] * 8)
+    assert sorted(round(w / 60) for w in waits) == list(range(8))
+
+
+def test_adaptive_rate_limiter_speeds_up_and_backs_off(tmp_path):
+    state_path = str(tmp_path / "state.json")
+    limiter = rate_limiter.AdaptiveRateLimiter(
+        wait_seconds=1, increase=0.25, state_path=state_path
+    )
+    limiter.record_success(0.1)
+    assert limiter.wait_seconds == pytest.approx(1 / 1.25)
+    limiter.record_rate_limit_hit()
+    assert limiter.wait_seconds == pytest.approx(1.6)
+    limiter.record_success(1.0)  # Much slower than before
+    assert limiter.wait_seconds == pytest.approx(3.2)
+
+    # What was learned survives restarts:
+    restarted = rate_limiter.AdaptiveRateLimiter(wait_seconds=1, state_path=state_path)
+    assert restarted.wait_seconds == pytest.approx(3.2)
+
+
+def test_source_reports_outcomes_to_rate_limiter(mocker):
+    outcomes = iter([RateLimitHitError(source="coingecko"), None])
+
+    def get_price_history(*_, **__) -> PriceHistory:
+        outcome = next(outcomes)
+        if outcome is not None:
+            raise outcome
+        return PriceHistory(df=None, currency=None)
+
+    mocker.patch("warnings.warn")
+    mocker.patch("time.sleep")
+    limiter = rate_limiter.AdaptiveRateLimiter(wait_seconds=1)
+    hit = mocker.spy(limiter, "record_rate_limit_hit")
+    success = mocker.spy(limiter, "record_success")
+    source = Source(
+        get_price_history=get_price_history,
+        get_search_results=None,
+        rate_limiter=limiter,
+    )
+    source.get_price_history_bruteforcefully("BTC")
+    assert hit.call_count == 1
+    assert success.call_count == 1
+
+
+def test_retry_policy_caps_and_jitters_back_off():
+    assert RetryPolicy().back_off_seconds(80) == 80
+    assert RetryPolicy(max_back_off=20).back_off_seconds(80) == 20
+    policy = RetryPolicy(max_back_off=20, jitter=True)
+    jittered = [policy.back_off_seconds(80) for _ in range(100)]
+    assert all(0 <= s <= 20 for s in jittered)
+    assert len(set(jittered)) > 1
+
+
+def test_retry_deadline_raises_timeout_error(mocker):
+    def mock_get_price_history_rate_limit_hit(*_, **__) -> PriceHistory:
+        raise RateLimitHitError(source="coingecko")
+
+    mocker.patch("warnings.warn")
+    source = Source(
+        get_price_history=mock_get_price_history_rate_limit_hit,
+        get_search_results=None,
+        rate_limiter=rate_limiter.RateLimiter(wait_seconds=1),
+        retry_policy=RetryPolicy(deadline=5),
+    )
+    # The initial back-off of 10 seconds would exceed the deadline already:
+    started_at = time.monotonic()
+    with pytest.raises(TimeoutError, match="deadline of 5 seconds"):
+        source.get_price_history_bruteforcefully("BTC")
+    assert time.monotonic() - started_at < 1
+
+    # Capped back-offs until the deadline passed:
+    with pytest.raises(RetryDeadlineExceededError):
+        source.get_price_history_bruteforcefully(
+            "BTC", retry_policy=RetryPolicy(deadline=0.1, max_back_off=0.02)
+        )
+    assert 1 < warnings.warn.call_count < 10
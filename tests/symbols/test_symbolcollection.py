@@ -2,7 +2,11 @@
 
 # pylint: disable=missing-function-docstring,invalid-name
 
+import pandas as pd
 import pytest
+from tessa import price_history, sources
+from tessa.price import PriceHistory
+from tessa.price.types import SymbolNotFoundError
 from tessa.symbol import SymbolCollection, Symbol
 
 
@@ -109,3 +113,46 @@ def test_to_and_save_yaml(tmp_path):
     sc2 = SymbolCollection()
     sc2.load_yaml(file)
     assert sc2.symbols == sc1.symbols
+
+
+def test_prefetch_warms_cache_and_reports_failures(mocker):
+    df = pd.DataFrame({"close": [1.0]}, index=pd.to_datetime(["2020-01-01"], utc=True))
+
+    def get_price_history(query, *_, **__):
+        if query == "FAIL":
+            raise SymbolNotFoundError(source="yahoo", query=query)
+        return PriceHistory(df, "USD")
+
+    src = sources.get_source("yahoo")
+    mocked = mocker.patch.object(
+        src, "get_price_history", side_effect=get_price_history
+    )
+    mocker.patch.object(src.rate_limiter, "rate_limit")
+    price_history.cache_clear()
+    sc = SymbolCollection(
+        [
+            Symbol("A"),
+            Symbol("A2", query="A"),
+            Symbol("F", query="FAIL"),
+            Symbol("C", source="coingecko", query="c"),
+        ]
+    )
+    progress = []
+    try:
+        failures = sc.prefetch(
+            workers=2,
+            sources=["yahoo"],
+            on_progress=lambda s, e, done, total: progress.append(
+                (s.name, done, total)
+            ),
+        )
+        assert list(failures) == ["F"]
+        assert isinstance(failures["F"], SymbolNotFoundError)
+        assert sorted(progress, key=lambda p: p[1])[-1][1:] == (3, 3)
+        assert {name for name, _, _ in progress} == {"A", "A2", "F"}
+        assert mocked.call_count == 2  # "A" only once
+
+        sc.find_one("A").price_history()
+        assert mocked.call_count == 2  # Served from the cache
+    finally:
+        price_history.cache_clear()
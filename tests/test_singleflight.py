@@ -0,0 +1,83 @@
+"""Test single-flight request coalescing."""
+
+# pylint: disable=missing-docstring
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import pytest
+from tessa.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def wait_for_followers(flights, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while flights.coalesced < count:
+        if time.monotonic() > deadline:
+            pytest.fail(f"Only {flights.coalesced} of {count} calls were coalesced")
+        time.sleep(0.01)
+
+
+def test_concurrent_calls_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(flights.do, "k", slow, 21) for _ in range(5)]
+        wait_for_followers(flights, 4)
+        release.set()
+        assert [f.result() for f in futures] == [42] * 5
+    assert calls == [21]
+
+    # Nothing in flight anymore, so the next call runs again:
+    assert flights.do("k", slow, 1) == 2
+    assert calls == [21, 1]
+
+
+def test_followers_get_the_error():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise KeyError("nope")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flights.do, "k", failing) for _ in range(3)]
+        wait_for_followers(flights, 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(KeyError):
+                future.result()
+
+
+def test_async_calls_share_one_task_and_its_error():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value < 0:
+            raise ValueError(value)
+        return value * 2
+
+    async def main():
+        assert (
+            await asyncio.gather(*(flights.do("k", slow, 21) for _ in range(5)))
+            == [42] * 5
+        )
+        results = await asyncio.gather(
+            *(flights.do("k", slow, -1) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(main())
+    assert calls == [21, -1]
+    assert flights.coalesced == 6